@@ -0,0 +1,399 @@
+import os
+import pty
+import sys
+import time
+import random
+import select
+import struct
+import threading
+from collections import deque
+
+from protocolo_serial import (
+    crc8, montar_quadro, INICIO_QUADRO, TAMANHO_MAXIMO_DADOS, VERSAO_PROTOCOLO, BAUD_LEGADO,
+    TIPO_HELLO, TIPO_HELLO_OK, TIPO_COMANDO, TIPO_PING, TIPO_BOTAO, TIPO_EFEITO_FIM, TIPO_ACK,
+    CODIGOS_COMANDO, COMANDOS_POR_CODIGO, TIMEOUT_ACK, TENTATIVAS_ENVIO,
+)
+
+# ===============================
+# 🔹 ARDUINO VIRTUAL
+# ===============================
+# Faz o papel do sketch `arduino` num pseudo-terminal, para rodar o
+# py16.py (e testes de carga) sem a placa. O caminho do pty vai em
+# QUIOSQUES no py16.py, como se fosse a porta do Arduino de verdade.
+#
+# Imita o sketch atual: efeitos sem delay() (a fita e o bônus andam em
+# paralelo e avisam no fim) e botões capturados "por interrupção": cada
+# aperto entra na hora numa fila de 16 com o instante, com debounce de
+# 300 ms por botão, e o quadro BOTAO leva a idade do aperto.
+#
+# Com legado=True imita o sketch antigo, inclusive o que ele tem de ruim:
+# depois de mandar um botão fica 300 ms parado (delay) e os efeitos
+# bloqueiam. Aperto que começa e termina enquanto ele está parado se
+# perde, e o que chega pela serial nesse tempo fica no buffer de 64 bytes
+# do Arduino (o que passar disso é perdido).
+DEBOUNCE = 0.3                  # 300 ms sem ler botão depois de cada aperto
+NUM_LEDS = 30
+PASSO_COBRA = 0.05              # delay(50) por LED no efeito cobrinha
+DURACAO_EFEITOS = {
+    "ACERTOU": NUM_LEDS * PASSO_COBRA + 0.5,   # cobrinha verde + delay(500)
+    "ERROU": NUM_LEDS * PASSO_COBRA,           # cobrinha vermelha
+    "BONUS": 2.0,                              # servo3 + delay(2000)
+    "RESET": 0.0,
+}
+BUFFER_RX_ARDUINO = 64          # bytes que o Arduino guarda enquanto não lê a serial
+DURACAO_APERTO = 0.08           # s que um aperto segura o botão
+TAMANHO_FILA_BOTOES = 16        # fila circular da interrupção
+ESPERA_VERIFICACAO = 2.0        # como no sketch: HELLO sem PING depois, volta para 9600 e texto
+
+
+class ArduinoVirtual:
+    def __init__(self, legado=False, link=None, mostrar=True):
+        # legado=True imita o sketch antigo: só protocolo de texto, ignora HELLO
+        self.legado = legado
+        self.mostrar = mostrar
+        self._mestre, self._escravo = pty.openpty()
+        self.porta = os.ttyname(self._escravo)
+        self.link = link
+        if link:
+            if os.path.lexists(link):
+                os.remove(link)
+            os.symlink(self.porta, link)
+
+        self.modo_binario = False
+        self.baud = BAUD_LEGADO
+        self._baud_verificado = True
+        self._momento_troca = 0.0
+        self._texto = bytearray()
+        self._estado = 0
+        self._quadro = {}
+        self._ultimo_seq_comando = None
+        self._seq_botao = 0
+        self._botao_pendente = None   # (numero, instante, tentativas, enviado_em)
+        self._apos_bloqueio = False
+        self._ultimo_aperto = {}      # botão -> instante do último aperto aceito
+        self._fila_botoes = deque()   # (botão, instante), como a fila da interrupção
+        self._fita = None             # (comando, termina_em) do efeito na fita
+        self._fim_bonus = None
+
+        self._apertos = []            # [botao, segurando_ate, visto] (sketch antigo: lido no loop)
+        self._trava = threading.Lock()
+        self._rodando = False
+        self.comandos_recebidos = []  # (instante, comando)
+        self.estatisticas = {
+            "apertos": 0,
+            "botoes_enviados": 0,
+            "apertos_perdidos": 0,
+            "fila_cheia": 0,
+            "reenvios_botao": 0,
+            "comandos": 0,
+            "comandos_repetidos": 0,
+            "efeitos_concluidos": 0,
+            "efeitos_interrompidos": 0,
+            "bytes_perdidos_rx": 0,
+            "erros_crc": 0,
+        }
+
+    # ---------- lado do "hardware" ----------
+
+    def pressionar(self, botao, duracao=DURACAO_APERTO):
+        """Segura o botão (1 a 4) por `duracao` segundos, como um dedo faria."""
+        agora = time.monotonic()
+        with self._trava:
+            self.estatisticas["apertos"] += 1
+            if self.legado:
+                self._apertos.append([int(botao), agora + duracao, False])
+                return
+            # interrupção: debounce pelo instante e anota na fila
+            if agora - self._ultimo_aperto.get(int(botao), -DEBOUNCE) < DEBOUNCE:
+                return
+            self._ultimo_aperto[int(botao)] = agora
+            if len(self._fila_botoes) >= TAMANHO_FILA_BOTOES - 1:
+                self.estatisticas["fila_cheia"] += 1
+                return
+            self._fila_botoes.append((int(botao), agora))
+
+    def _proximo_capturado(self):
+        # no binário manda um de cada vez: espera o ACK do anterior
+        if self.modo_binario and self._botao_pendente:
+            return None
+        with self._trava:
+            return self._fila_botoes.popleft() if self._fila_botoes else None
+
+    def _botao_apertado(self):
+        agora = time.monotonic()
+        with self._trava:
+            for aperto in [a for a in self._apertos if a[1] <= agora]:
+                if not aperto[2]:
+                    self.estatisticas["apertos_perdidos"] += 1
+                self._apertos.remove(aperto)
+            # o sketch testa vermelho, amarelo, azul e verde nessa ordem
+            for botao in (1, 2, 3, 4):
+                for aperto in self._apertos:
+                    if aperto[0] == botao:
+                        aperto[2] = True
+                        return botao
+        return None
+
+    def _delay(self, segundos):
+        if segundos > 0:
+            time.sleep(segundos)
+            self._apos_bloqueio = True
+
+    def _escrever(self, dados):
+        os.write(self._mestre, dados)
+
+    def _log(self, mensagem):
+        if self.mostrar:
+            print(mensagem)
+
+    # ---------- loop() do sketch ----------
+
+    def iniciar(self):
+        self._rodando = True
+        thread = threading.Thread(target=self._loop, daemon=True)
+        thread.start()
+        return thread
+
+    def parar(self):
+        self._rodando = False
+        if self.link and os.path.lexists(self.link):
+            os.remove(self.link)
+
+    def _loop(self):
+        while self._rodando:
+            if self.legado:
+                botao = self._botao_apertado()
+                if botao:
+                    self._enviar_botao(botao, time.monotonic())
+                    self._delay(DEBOUNCE)
+            else:
+                capturado = self._proximo_capturado()
+                if capturado:
+                    self._enviar_botao(*capturado)
+            self._atualizar_efeitos()
+            self._receber()
+            self._reenviar_botao()
+            if not self._baud_verificado and time.monotonic() - self._momento_troca > ESPERA_VERIFICACAO:
+                self.baud = BAUD_LEGADO
+                self.modo_binario = False
+                self._botao_pendente = None
+                self._baud_verificado = True
+                self._log("↩ sem PING depois do HELLO: de volta ao protocolo de texto a 9600")
+            # loop() real dá milhares de voltas por segundo; 1 ms basta aqui
+            select.select([self._mestre], [], [], 0.001)
+
+    def _receber(self):
+        dados = b""
+        while select.select([self._mestre], [], [], 0)[0]:
+            dados += os.read(self._mestre, 1024)
+        if self._apos_bloqueio and len(dados) > BUFFER_RX_ARDUINO:
+            self.estatisticas["bytes_perdidos_rx"] += len(dados) - BUFFER_RX_ARDUINO
+            dados = dados[:BUFFER_RX_ARDUINO]
+        self._apos_bloqueio = False
+        for byte in dados:
+            self._receber_byte(byte)
+
+    # ---------- protocolo (o mesmo do sketch) ----------
+
+    def _quadro_botao(self, numero, instante):
+        idade = min(int((time.monotonic() - instante) * 1000), 65535)
+        return montar_quadro(TIPO_BOTAO, self._seq_botao, struct.pack("<BH", numero, idade))
+
+    def _enviar_botao(self, numero, instante):
+        self.estatisticas["botoes_enviados"] += 1
+        self._log(f"🕹 BTN{numero}")
+        if not self.modo_binario:
+            self._escrever(f"BTN{numero}\r\n".encode())
+            return
+        self._seq_botao = (self._seq_botao + 1) & 0xFF
+        self._botao_pendente = (numero, instante, 1, time.monotonic())
+        self._escrever(self._quadro_botao(numero, instante))
+
+    def _reenviar_botao(self):
+        if not self._botao_pendente:
+            return
+        numero, instante, tentativas, enviado_em = self._botao_pendente
+        if time.monotonic() - enviado_em < TIMEOUT_ACK:
+            return
+        if tentativas >= TENTATIVAS_ENVIO:
+            self._botao_pendente = None
+            return
+        self.estatisticas["reenvios_botao"] += 1
+        self._botao_pendente = (numero, instante, tentativas + 1, time.monotonic())
+        self._escrever(self._quadro_botao(numero, instante))
+
+    def _executar(self, comando):
+        self.estatisticas["comandos"] += 1
+        self.comandos_recebidos.append((time.monotonic(), comando))
+        self._log(f"💡 {comando} ({DURACAO_EFEITOS[comando]:.1f} s)")
+        if not self.modo_binario and comando in ("ACERTOU", "ERROU"):
+            self._escrever(f"{comando}\r\n".encode())
+        if self.legado:
+            self._delay(DURACAO_EFEITOS[comando])
+            return
+        termina_em = time.monotonic() + DURACAO_EFEITOS[comando]
+        if comando in ("ACERTOU", "ERROU"):
+            if self._fita:
+                self._avisar_fim(self._fita[0], False)
+            self._fita = (comando, termina_em)
+        elif comando == "BONUS":
+            self._fim_bonus = termina_em
+        elif comando == "RESET":
+            if self._fita:
+                self._avisar_fim(self._fita[0], False)
+            if self._fim_bonus:
+                self._avisar_fim("BONUS", False)
+            self._fita = self._fim_bonus = None
+
+    def _atualizar_efeitos(self):
+        agora = time.monotonic()
+        if self._fita and agora >= self._fita[1]:
+            comando, self._fita = self._fita[0], None
+            self._avisar_fim(comando, True)
+        if self._fim_bonus and agora >= self._fim_bonus:
+            self._fim_bonus = None
+            self._avisar_fim("BONUS", True)
+
+    def _avisar_fim(self, comando, concluido):
+        self.estatisticas["efeitos_concluidos" if concluido else "efeitos_interrompidos"] += 1
+        if self.modo_binario:
+            self._escrever(montar_quadro(TIPO_EFEITO_FIM, 0, bytes((CODIGOS_COMANDO[comando], int(concluido)))))
+        else:
+            self._escrever(f"{'FIM' if concluido else 'INTERROMPIDO'} {comando}\r\n".encode())
+
+    def _receber_byte(self, byte):
+        if self._estado == 0:
+            if byte == INICIO_QUADRO and not self.legado:
+                self._estado, self._crc = 1, 0
+            elif not self.modo_binario:
+                if byte == ord("\n"):
+                    comando = self._texto.decode(errors="ignore").strip()
+                    self._texto.clear()
+                    # o sketch antigo não conhece RESET
+                    if comando in ("ACERTOU", "ERROU", "BONUS") or (comando == "RESET" and not self.legado):
+                        self._executar(comando)
+                elif len(self._texto) < 32:
+                    self._texto.append(byte)
+            return
+
+        if self._estado < 5:
+            # crc8 de um byte partindo de crc ^ byte = um passo do crc incremental
+            self._crc = crc8(bytes((self._crc ^ byte,)))
+        if self._estado == 1:
+            self._quadro = {"tamanho": byte, "dados": bytearray()}
+            self._estado = 2 if byte <= TAMANHO_MAXIMO_DADOS else 0
+        elif self._estado == 2:
+            self._quadro["tipo"] = byte
+            self._estado = 3
+        elif self._estado == 3:
+            self._quadro["seq"] = byte
+            self._estado = 4 if self._quadro["tamanho"] else 5
+        elif self._estado == 4:
+            self._quadro["dados"].append(byte)
+            if len(self._quadro["dados"]) == self._quadro["tamanho"]:
+                self._estado = 5
+        else:
+            self._estado = 0
+            if byte == self._crc:
+                self._tratar_quadro(self._quadro["tipo"], self._quadro["seq"], bytes(self._quadro["dados"]))
+            else:
+                self.estatisticas["erros_crc"] += 1
+
+    def _tratar_quadro(self, tipo, seq, dados):
+        self._baud_verificado = True
+        if tipo == TIPO_HELLO and len(dados) >= 4:
+            pedido = struct.unpack("<I", dados[:4])[0]
+            aceito = pedido if BAUD_LEGADO <= pedido <= 1000000 else BAUD_LEGADO
+            self.modo_binario = True
+            self._botao_pendente = None
+            self._ultimo_seq_comando = None
+            self._escrever(montar_quadro(TIPO_HELLO_OK, seq, struct.pack("<BI", VERSAO_PROTOCOLO, aceito)))
+            self.baud = aceito
+            # como no sketch: o binário só vale depois do PING do servidor
+            self._baud_verificado = False
+            self._momento_troca = time.monotonic()
+            self._log(f"🔗 protocolo binário a {aceito} baud")
+        elif tipo == TIPO_PING:
+            self.modo_binario = True
+            self._escrever(montar_quadro(TIPO_ACK, seq))
+        elif tipo == TIPO_ACK:
+            if self._botao_pendente and seq == self._seq_botao:
+                self._botao_pendente = None
+        elif tipo == TIPO_COMANDO and dados:
+            # confirma antes de começar o efeito, como o sketch
+            self._escrever(montar_quadro(TIPO_ACK, seq))
+            if seq == self._ultimo_seq_comando:
+                self.estatisticas["comandos_repetidos"] += 1
+                return
+            self._ultimo_seq_comando = seq
+            comando = COMANDOS_POR_CODIGO.get(dados[0])
+            if comando:
+                self._executar(comando)
+
+    # ---------- geradores de apertos ----------
+
+    def roteiro(self, eventos):
+        """Aperta os botões de `eventos` = [(segundos desde o início, botão[, duração])]."""
+        inicio = time.monotonic()
+        for evento in sorted(eventos):
+            espera = inicio + evento[0] - time.monotonic()
+            if espera > 0:
+                time.sleep(espera)
+            self.pressionar(*evento[1:])
+
+    def aleatorio(self, taxa, duracao, botoes=(1, 2, 3, 4), semente=None):
+        """Apertos ao acaso, em média `taxa` por segundo, durante `duracao` segundos."""
+        sorteio = random.Random(semente)
+        fim = time.monotonic() + duracao
+        while True:
+            espera = sorteio.expovariate(taxa)
+            if time.monotonic() + espera >= fim:
+                break
+            time.sleep(espera)
+            self.pressionar(sorteio.choice(botoes))
+
+
+def ler_roteiro(caminho):
+    """Arquivo com uma linha por aperto: "segundos botão [duração]" (# comenta)."""
+    eventos = []
+    with open(caminho, encoding="utf-8") as arquivo:
+        for linha in arquivo:
+            linha = linha.split("#", 1)[0].split()
+            if linha:
+                eventos.append((float(linha[0]), int(linha[1]), *map(float, linha[2:3])))
+    return eventos
+
+
+if __name__ == "__main__":
+    # uso: python arduino_virtual.py [--legado] [--link /tmp/arduino]
+    #                                [--roteiro arquivo.txt | --aleatorio APERTOS_POR_S] [--duracao S]
+    argumentos = sys.argv[1:]
+
+    def opcao(nome, padrao=None):
+        if nome in argumentos:
+            posicao = argumentos.index(nome)
+            return argumentos[posicao + 1]
+        return padrao
+
+    arduino = ArduinoVirtual(legado="--legado" in argumentos, link=opcao("--link"))
+    arduino.iniciar()
+    print(f"🤖 Arduino virtual em {arduino.link or arduino.porta} "
+          f"({'sketch antigo' if arduino.legado else 'sketch novo'})")
+    print("   coloque esse caminho em QUIOSQUES no py16.py")
+    duracao = float(opcao("--duracao", "0")) or None
+    inicio = time.monotonic()
+    try:
+        if opcao("--roteiro"):
+            arduino.roteiro(ler_roteiro(opcao("--roteiro")))
+        elif opcao("--aleatorio"):
+            arduino.aleatorio(float(opcao("--aleatorio")), duracao or float("inf"))
+        if duracao:
+            time.sleep(max(0.0, inicio + duracao - time.monotonic()))
+        else:
+            while True:
+                time.sleep(1)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        arduino.parar()
+        print(arduino.estatisticas)
@@ -0,0 +1,628 @@
+import sqlite3
+import threading
+import queue
+import time
+import atexit
+import datetime
+import os
+from collections import OrderedDict
+from contextlib import contextmanager
+
+# ===============================
+# 🔹 CONFIGURAÇÃO DO BANCO
+# ===============================
+ARQUIVO_BANCO = "quiz.db"
+TAMANHO_POOL = 4          # conexões abertas ao mesmo tempo
+CACHE_COMANDOS = 64       # comandos preparados guardados por conexão
+VERIFICAR_APOS = 30       # segundos parada antes de testar a conexão de novo
+MODO_JOURNAL = "WAL"      # WAL: leitores não bloqueiam quem grava
+MODO_SYNC = "NORMAL"      # em WAL, NORMAL só faz fsync no checkpoint
+ESPERA_TRAVA = 5.0        # segundos que o SQLite espera um lock antes de desistir
+TENTATIVAS_TRAVA = 5      # novas tentativas quando mesmo assim dá "database is locked"
+ESPERA_INICIAL = 0.05     # primeira pausa entre tentativas (dobra a cada vez)
+INTERVALO_CHECKPOINT = 60 # segundos entre checkpoints do WAL
+
+
+# ===============================
+# 🔹 ESTATÍSTICAS DE TRAVAS
+# ===============================
+estatisticas_trava = {
+    "operacoes": 0,
+    "conflitos": 0,           # vezes que deu "database is locked/busy"
+    "desistencias": 0,        # operações que falharam mesmo após retentar
+    "espera_total": 0.0,      # segundos perdidos em conflitos + pausas
+    "maior_espera": 0.0,
+    "checkpoints": 0,
+    "ultimo_checkpoint": None,  # (busy, páginas no log, páginas copiadas)
+    "ultima_escrita": None,     # time.time() da última transação concluída
+}
+
+
+def _eh_trava(erro):
+    msg = str(erro).lower()
+    return "locked" in msg or "busy" in msg
+
+
+# ===============================
+# 🔹 DATAS
+# ===============================
+# As datas são gravadas como inteiro (milissegundos desde 1970, UTC):
+# ocupam menos espaço, não precisam de strftime a cada INSERT e dá para
+# filtrar por intervalo usando índice. Só viram texto na hora de mostrar.
+def agora_ms():
+    return int(time.time() * 1000)
+
+
+def formatar_data(ms, formato="%Y-%m-%d %H:%M:%S"):
+    if ms is None:
+        return None
+    return datetime.datetime.fromtimestamp(ms / 1000).strftime(formato)
+
+
+def ler_data(valor, formato="%Y-%m-%d %H:%M:%S"):
+    """Contrário de formatar_data; aceita também o número em ms."""
+    if valor is None or valor == "":
+        return None
+    if isinstance(valor, int) or str(valor).isdigit():
+        return int(valor)
+    return int(datetime.datetime.strptime(valor, formato).timestamp() * 1000)
+
+
+# ===============================
+# 🔹 POOL DE CONEXÕES
+# ===============================
+class PoolConexoes:
+    """Mantém conexões abertas com o quiz.db para não abrir/fechar a cada resposta.
+
+    Cada green thread pega uma conexão com `conexao()` e devolve ao sair do
+    `with`. Se a mesma thread chamar `conexao()` de novo lá dentro, recebe a
+    mesma conexão (o commit só acontece no `with` de fora).
+    """
+
+    def __init__(self, arquivo=ARQUIVO_BANCO, tamanho=TAMANHO_POOL):
+        self.arquivo = arquivo
+        self.tamanho = tamanho
+        self._livres = queue.LifoQueue()
+        self._abertas = 0
+        self._trava = threading.Lock()
+        self._local = threading.local()
+
+    def _nova_conexao(self):
+        conn = sqlite3.connect(
+            self.arquivo,
+            timeout=ESPERA_TRAVA,
+            check_same_thread=False,
+            cached_statements=CACHE_COMANDOS,
+            uri=True,  # permite ATTACH "file:...?mode=ro" das partições
+        )
+        # só vale para banco novo; nos antigos a manutenção converte com um VACUUM
+        conn.execute("PRAGMA auto_vacuum=INCREMENTAL")
+        conn.execute(f"PRAGMA journal_mode={MODO_JOURNAL}")
+        conn.execute(f"PRAGMA synchronous={MODO_SYNC}")
+        return conn
+
+    def _saudavel(self, conn):
+        try:
+            conn.execute("SELECT 1").fetchone()
+            return True
+        except sqlite3.Error:
+            return False
+
+    def _pegar(self):
+        try:
+            conn, ultimo_uso = self._livres.get_nowait()
+        except queue.Empty:
+            with self._trava:
+                pode_abrir = self._abertas < self.tamanho
+                if pode_abrir:
+                    self._abertas += 1
+            if pode_abrir:
+                try:
+                    return self._nova_conexao()
+                except Exception:
+                    with self._trava:
+                        self._abertas -= 1
+                    raise
+            # pool cheio: espera alguém devolver
+            conn, ultimo_uso = self._livres.get()
+
+        # conexão parada há muito tempo: testa antes de usar
+        if time.monotonic() - ultimo_uso > VERIFICAR_APOS and not self._saudavel(conn):
+            self._descartar(conn)
+            return self._pegar()
+        return conn
+
+    def _devolver(self, conn):
+        if conn.in_transaction:
+            conn.rollback()
+        self._livres.put((conn, time.monotonic()))
+
+    def _descartar(self, conn):
+        try:
+            conn.close()
+        except sqlite3.Error:
+            pass
+        with self._trava:
+            self._abertas -= 1
+
+    @contextmanager
+    def conexao(self):
+        local = self._local
+        conn = getattr(local, "conn", None)
+        if conn is not None:
+            # já tem conexão nesta thread: reaproveita
+            yield conn
+            return
+
+        conn = self._pegar()
+        local.conn = conn
+        try:
+            yield conn
+            conn.commit()
+        except BaseException:
+            local.conn = None
+            try:
+                conn.rollback()
+                self._devolver(conn)
+            except sqlite3.Error:
+                # conexão ficou ruim: não volta para o pool
+                self._descartar(conn)
+            raise
+        else:
+            local.conn = None
+            self._devolver(conn)
+
+    def fechar(self):
+        while True:
+            try:
+                conn, _ = self._livres.get_nowait()
+            except queue.Empty:
+                break
+            self._descartar(conn)
+
+
+pool = PoolConexoes()
+
+
+def conexao():
+    return pool.conexao()
+
+
+def com_retentativa(funcao, *args, pool_conexoes=None):
+    """Roda `funcao(conn, *args)` numa transação, tentando de novo se o banco estiver travado."""
+    pool_conexoes = pool_conexoes or pool
+    espera = ESPERA_INICIAL
+    esperou = 0.0
+    estatisticas_trava["operacoes"] += 1
+    for tentativa in range(TENTATIVAS_TRAVA + 1):
+        inicio = time.monotonic()
+        try:
+            with pool_conexoes.conexao() as conn:
+                resultado = funcao(conn, *args)
+            break
+        except sqlite3.OperationalError as e:
+            if not _eh_trava(e):
+                raise
+            estatisticas_trava["conflitos"] += 1
+            esperou += time.monotonic() - inicio
+            if tentativa == TENTATIVAS_TRAVA:
+                estatisticas_trava["desistencias"] += 1
+                _registrar_espera(esperou)
+                raise
+            time.sleep(espera)
+            esperou += espera
+            espera *= 2
+    _registrar_espera(esperou)
+    estatisticas_trava["ultima_escrita"] = time.time()
+    return resultado
+
+
+def _registrar_espera(segundos):
+    if segundos:
+        estatisticas_trava["espera_total"] += segundos
+        estatisticas_trava["maior_espera"] = max(estatisticas_trava["maior_espera"], segundos)
+
+
+# ===============================
+# 🔹 CHECKPOINT PERIÓDICO DO WAL
+# ===============================
+def checkpoint(modo="PASSIVE"):
+    with conexao() as conn:
+        resultado = conn.execute(f"PRAGMA wal_checkpoint({modo})").fetchone()
+    estatisticas_trava["checkpoints"] += 1
+    estatisticas_trava["ultimo_checkpoint"] = resultado
+    return resultado
+
+
+def iniciar_checkpoints(intervalo=INTERVALO_CHECKPOINT):
+    def loop():
+        while True:
+            time.sleep(intervalo)
+            try:
+                checkpoint()
+            except sqlite3.Error as e:
+                print(f"⚠ Erro no checkpoint do banco: {e}")
+
+    thread = threading.Thread(target=loop, daemon=True)
+    thread.start()
+    return thread
+
+
+def estatisticas():
+    return dict(
+        estatisticas_trava,
+        tamanho_pool=pool.tamanho,
+        conexoes_abertas=pool._abertas,
+        cache_jogadores=cache_jogadores.estatisticas(),
+    )
+
+
+# ===============================
+# 🔹 FILA DE GRAVAÇÃO EM LOTE
+# ===============================
+LOTE_MAXIMO = 50          # grava assim que juntar esta quantidade de linhas
+JANELA_GRAVACAO = 0.5     # segundos máximos que uma linha fica só na memória
+
+
+class FilaGravacao:
+    """Junta INSERTs e grava vários de uma vez, num único commit.
+
+    As linhas ficam na memória até juntar `lote_maximo` ou passar `janela`
+    segundos, o que vier primeiro. Se o servidor cair, perde no máximo a
+    janela. `parar()` (chamado também no atexit) grava tudo que sobrou.
+
+    `ao_gravar(marcas)` é chamado depois de cada commit com as marcas
+    passadas em `adicionar` (ex.: instante de chegada, para medir latência).
+    """
+
+    def __init__(self, sql, lote_maximo=LOTE_MAXIMO, janela=JANELA_GRAVACAO, pool_conexoes=None,
+                 ao_gravar=None):
+        self.sql = sql
+        self.lote_maximo = lote_maximo
+        self.janela = janela
+        self.pool = pool_conexoes  # None = pool global do momento da gravação
+        self.ao_gravar = ao_gravar
+        self._pendentes = []
+        self._marcas = []
+        self._trava = threading.Lock()
+        self._acordar = threading.Event()
+        self._thread = None
+        self._rodando = False
+        self.descartadas = 0  # linhas com erro permanente, jogadas fora
+        atexit.register(self.parar)
+
+    def adicionar(self, linha, marca=None):
+        with self._trava:
+            self._pendentes.append(linha)
+            self._marcas.append(marca)
+            cheio = len(self._pendentes) >= self.lote_maximo
+        if not self._rodando:
+            self.iniciar()
+        if cheio:
+            self._acordar.set()
+
+    def descarregar(self):
+        with self._trava:
+            lote, self._pendentes = self._pendentes, []
+            marcas, self._marcas = self._marcas, []
+        if not lote:
+            return 0
+        try:
+            com_retentativa(self._gravar, lote, pool_conexoes=self.pool)
+        except sqlite3.OperationalError as e:
+            if not _eh_trava(e):
+                return self._gravar_uma_a_uma(lote, marcas)
+            # banco travado: devolve para a fila para tentar de novo no próximo lote
+            self._devolver(lote, marcas)
+            raise
+        except sqlite3.Error:
+            # erro que não passa tentando de novo (tipo errado, IntegrityError...):
+            # grava linha por linha e descarta só as linhas ruins
+            return self._gravar_uma_a_uma(lote, marcas)
+        if self.ao_gravar:
+            self.ao_gravar([marca for marca in marcas if marca is not None])
+        return len(lote)
+
+    def _gravar_uma_a_uma(self, lote, marcas):
+        gravadas, marcas_gravadas = 0, []
+        for posicao, (linha, marca) in enumerate(zip(lote, marcas)):
+            try:
+                com_retentativa(self._gravar, [linha], pool_conexoes=self.pool)
+            except sqlite3.OperationalError as e:
+                if _eh_trava(e):
+                    self._devolver(lote[posicao:], marcas[posicao:])
+                    raise
+                self._descartar(linha, e)
+                continue
+            except sqlite3.Error as e:
+                self._descartar(linha, e)
+                continue
+            gravadas += 1
+            if marca is not None:
+                marcas_gravadas.append(marca)
+        if self.ao_gravar:
+            self.ao_gravar(marcas_gravadas)
+        return gravadas
+
+    def _descartar(self, linha, erro):
+        self.descartadas += 1
+        print(f"⚠ Linha descartada (não grava no banco): {linha!r} - {erro}")
+
+    def _devolver(self, lote, marcas):
+        with self._trava:
+            self._pendentes[:0] = lote
+            self._marcas[:0] = marcas
+
+    def _gravar(self, conn, lote):
+        conn.executemany(self.sql, lote)
+
+    def iniciar(self):
+        with self._trava:
+            if self._rodando:
+                return
+            self._rodando = True
+        self._thread = threading.Thread(target=self._loop, daemon=True)
+        self._thread.start()
+
+    def parar(self):
+        self._rodando = False
+        self._acordar.set()
+        self.descarregar()
+
+    def _loop(self):
+        while self._rodando:
+            self._acordar.wait(self.janela)
+            self._acordar.clear()
+            try:
+                self.descarregar()
+            except sqlite3.Error as e:
+                print(f"⚠ Erro gravando lote no banco: {e}")
+
+
+# ===============================
+# 🔹 CACHE DE IDS DOS JOGADORES
+# ===============================
+TAMANHO_CACHE_JOGADORES = 256
+
+
+class CacheJogadores:
+    """Guarda (nome, ano) -> jogador_id dos jogadores recentes (LRU)."""
+
+    def __init__(self, tamanho=TAMANHO_CACHE_JOGADORES):
+        self.tamanho = tamanho
+        self._itens = OrderedDict()
+        self.acertos = 0
+        self.falhas = 0
+
+    def pegar(self, nome, ano):
+        chave = (nome, ano)
+        jogador_id = self._itens.get(chave)
+        if jogador_id is None:
+            self.falhas += 1
+            return None
+        self._itens.move_to_end(chave)
+        self.acertos += 1
+        return jogador_id
+
+    def guardar(self, nome, ano, jogador_id):
+        self._itens[(nome, ano)] = jogador_id
+        self._itens.move_to_end((nome, ano))
+        if len(self._itens) > self.tamanho:
+            self._itens.popitem(last=False)
+
+    def invalidar(self, nome, ano):
+        self._itens.pop((nome, ano), None)
+
+    def limpar(self):
+        self._itens.clear()
+
+    def estatisticas(self):
+        return {"itens": len(self._itens), "acertos": self.acertos, "falhas": self.falhas}
+
+
+cache_jogadores = CacheJogadores()
+
+
+def normalizar_nome(nome):
+    """Chave usada para reconhecer o mesmo aluno: sem espaços extras e sem diferença de maiúsculas."""
+    return " ".join((nome or "").split()).casefold()
+
+
+def registrar_jogador(conn, nome, ano):
+    """Devolve o id do jogador (nome, ano), criando a linha só se ainda não existir."""
+    nome = " ".join((nome or "").split())
+    ano = (ano or "").strip()
+    return conn.execute("""
+        INSERT INTO jogadores (nome, ano, nome_chave, data_criacao)
+        VALUES (?, ?, ?, ?)
+        ON CONFLICT(nome_chave, ano) DO UPDATE SET nome_chave = excluded.nome_chave
+        RETURNING id
+    """, (nome, ano, normalizar_nome(nome), agora_ms())).fetchone()[0]
+
+
+def id_do_jogador(conn, nome, ano):
+    """Igual a registrar_jogador, mas consulta o cache antes de ir ao banco."""
+    chave = normalizar_nome(nome)
+    jogador_id = cache_jogadores.pegar(chave, ano)
+    if jogador_id is None:
+        jogador_id = registrar_jogador(conn, nome, ano)
+        cache_jogadores.guardar(chave, ano, jogador_id)
+    return jogador_id
+
+
+# ===============================
+# 🔹 CÓPIA PARA RELATÓRIOS
+# ===============================
+# Os relatórios dos professores leem uma cópia do quiz.db feita pela API de
+# backup do SQLite, assim não disputam o banco com os quiosques. São dois
+# arquivos usados em rodízio: a cópia nova é escrita no arquivo que não
+# está em uso e só depois passa a ser a atual.
+#
+# Com o banco em memória (usar_memoria) a cópia sai da memória, não do
+# quiz.db, que fica até INTERVALO_GRAVACAO_DISCO segundos atrasado.
+ARQUIVOS_SNAPSHOT = ("quiz-relatorio-a.db", "quiz-relatorio-b.db")
+INTERVALO_SNAPSHOT = 30   # segundos entre cópias
+PAGINAS_POR_PASSO = 1024  # backup em passos: entre um e outro quem grava pega a trava
+
+try:
+    # a cópia roda numa thread de verdade para não travar o eventlet
+    from eventlet import patcher
+    threading_real = patcher.original("threading")
+    time_real = patcher.original("time")
+except ImportError:
+    threading_real = threading
+    time_real = time
+
+
+class SnapshotRelatorios:
+    def __init__(self, origem=ARQUIVO_BANCO, arquivos=ARQUIVOS_SNAPSHOT, intervalo=INTERVALO_SNAPSHOT):
+        self.origem = origem
+        self.arquivos = arquivos
+        self.intervalo = intervalo
+        self.atual = None
+        self.momento = None
+        self.duracao = None
+        self._proximo = 0
+        self._trava = threading_real.Lock()
+
+    def atualizar(self):
+        with self._trava:
+            destino_arquivo = self.arquivos[self._proximo]
+            inicio = time_real.monotonic()
+            # uri=True: a origem pode ser o banco em memória (URI_MEMORIA)
+            origem = sqlite3.connect(self.origem, uri=True, timeout=ESPERA_TRAVA)
+            destino = sqlite3.connect(destino_arquivo, timeout=ESPERA_TRAVA)
+            try:
+                origem.backup(destino, pages=PAGINAS_POR_PASSO)
+                # a cópia herda o modo WAL; em modo normal ela é um arquivo só
+                destino.execute("PRAGMA journal_mode=DELETE")
+            finally:
+                destino.close()
+                origem.close()
+            self.atual = destino_arquivo
+            self.momento = time_real.time()
+            self.duracao = time_real.monotonic() - inicio
+            self._proximo = (self._proximo + 1) % len(self.arquivos)
+
+    def idade(self):
+        """Segundos desde a última cópia (None se ainda não houve cópia)."""
+        if self.momento is None:
+            return None
+        return round(time.time() - self.momento, 1)
+
+    @contextmanager
+    def conexao(self):
+        if self.atual is None:
+            self.atualizar()
+        uri = "file:" + os.path.abspath(self.atual) + "?mode=ro"
+        conn = sqlite3.connect(uri, uri=True, timeout=ESPERA_TRAVA)
+        try:
+            yield conn
+        finally:
+            conn.close()
+
+    def iniciar(self):
+        def loop():
+            while True:
+                try:
+                    self.atualizar()
+                except sqlite3.Error as e:
+                    print(f"⚠ Erro copiando banco para relatórios: {e}")
+                time_real.sleep(self.intervalo)
+
+        thread = threading_real.Thread(target=loop, daemon=True)
+        thread.start()
+        return thread
+
+
+snapshot = SnapshotRelatorios()
+
+
+# ===============================
+# 🔹 BANCO EM MEMÓRIA (OPCIONAL)
+# ===============================
+# Para eventos curtos em cartão SD lento: o banco inteiro fica em memória
+# e é copiado para o quiz.db a cada INTERVALO_GRAVACAO_DISCO segundos e ao
+# desligar. Gravar uma resposta vira operação de memória; se a máquina
+# desligar de repente, perde no máximo o último intervalo.
+INTERVALO_GRAVACAO_DISCO = 10
+URI_MEMORIA = "file:quiz_memoria?mode=memory&cache=shared"
+
+
+class BancoEmMemoria:
+    def __init__(self, arquivo=ARQUIVO_BANCO, intervalo=INTERVALO_GRAVACAO_DISCO):
+        self.arquivo = arquivo
+        self.intervalo = intervalo
+        # uma conexão só: sem disputa de trava dentro do cache compartilhado
+        self.pool = PoolConexoes(URI_MEMORIA, tamanho=1)
+        # o banco em memória some quando a última conexão fecha; esta segura ele
+        self._ancora = sqlite3.connect(URI_MEMORIA, uri=True, check_same_thread=False)
+        self.ultima_gravacao = None
+        self.duracao = None
+        self._trava = threading_real.Lock()
+
+    def carregar(self):
+        disco = sqlite3.connect(self.arquivo, timeout=ESPERA_TRAVA)
+        try:
+            with self.pool.conexao() as conn:
+                disco.backup(conn)
+        finally:
+            disco.close()
+
+    def gravar(self):
+        """Copia a memória para o disco sem segurar a conexão do pool.
+
+        Primeiro copia para um banco em memória só desta cópia (rápido; a
+        trava do cache compartilhado fica presa só por um passo de cada
+        vez) e depois, sem trava nenhuma, dele para o arquivo no cartão SD.
+        Roda numa thread de verdade (iniciar) para não parar o eventlet.
+        """
+        with self._trava:
+            inicio = time_real.monotonic()
+            origem = sqlite3.connect(URI_MEMORIA, uri=True, timeout=ESPERA_TRAVA)
+            copia = sqlite3.connect(":memory:")
+            try:
+                origem.backup(copia, pages=PAGINAS_POR_PASSO)
+                origem.close()
+                disco = sqlite3.connect(self.arquivo, timeout=ESPERA_TRAVA)
+                try:
+                    copia.backup(disco, pages=PAGINAS_POR_PASSO)
+                finally:
+                    disco.close()
+            finally:
+                origem.close()
+                copia.close()
+            self.ultima_gravacao = time_real.time()
+            self.duracao = time_real.monotonic() - inicio
+
+    def iniciar(self):
+        def loop():
+            while True:
+                time_real.sleep(self.intervalo)
+                try:
+                    self.gravar()
+                except sqlite3.Error as e:
+                    print(f"⚠ Erro gravando banco em memória no disco: {e}")
+
+        thread = threading_real.Thread(target=loop, daemon=True)
+        thread.start()
+        return thread
+
+
+banco_memoria = None
+
+
+def usar_memoria(arquivo=ARQUIVO_BANCO, intervalo=INTERVALO_GRAVACAO_DISCO):
+    """Troca o pool global por um banco em memória carregado do `arquivo`.
+
+    Tem que ser chamado antes de criar as FilaGravacao, para que a cópia
+    final no disco (atexit) aconteça depois de as filas esvaziarem.
+    """
+    global pool, banco_memoria
+    banco_memoria = BancoEmMemoria(arquivo, intervalo)
+    banco_memoria.carregar()
+    pool = banco_memoria.pool
+    # relatórios copiam da memória, que é onde estão os dados mais novos
+    snapshot.origem = URI_MEMORIA
+    atexit.register(banco_memoria.gravar)
+    return banco_memoria
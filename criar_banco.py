@@ -1,30 +1,11 @@
-import sqlite3
+from migracoes import migrar
 
-def criar_banco():
-    conn = sqlite3.connect("quiz.db")
-    c = conn.cursor()
-
-    
-
-    # Tabela de alunos
-    c.execute('''CREATE TABLE IF NOT EXISTS alunos (
-        id INTEGER PRIMARY KEY AUTOINCREMENT,
-        nome TEXT NOT NULL,
-        ano TEXT NOT NULL
-    )''')
 
-    # Tabela de resultados (agora guarda cada questão)
-    c.execute('''CREATE TABLE IF NOT EXISTS resultados (
-        id INTEGER PRIMARY KEY AUTOINCREMENT,
-        aluno_id INTEGER NOT NULL,
-        categoria TEXT NOT NULL,
-        acertou INTEGER NOT NULL,
-        data TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-        FOREIGN KEY(aluno_id) REFERENCES alunos(id)
-    )''')
-
-    conn.commit()
-    conn.close()
+def criar_banco():
+    # O esquema (jogadores / resultados) e os índices ficam em migracoes.py,
+    # assim este script, o pycombanco.py e o py16.py usam o mesmo esquema.
+    # Bancos antigos com a tabela "alunos" são convertidos automaticamente.
+    migrar()
 
 if __name__ == "__main__":
     criar_banco()
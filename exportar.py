@@ -0,0 +1,181 @@
+import sys
+import csv
+import json
+from itertools import islice
+
+from banco import conexao, formatar_data, ler_data, normalizar_nome
+
+
+class ErroImportacao(ValueError):
+    pass
+
+# ===============================
+# 🔹 EXPORTAÇÃO / IMPORTAÇÃO
+# ===============================
+# Exporta jogadores e resultados para CSV (planilha) ou JSONL, lendo linha
+# a linha do cursor, e importa de volta em lotes com executemany numa
+# transação só. Nenhum dos dois carrega a tabela inteira na memória.
+#
+# data_criacao sai como está no banco (ms desde 1970, UTC), para a volta
+# não perder nada; a coluna "data" ao lado é só para ler na planilha.
+#
+# A importação pode ser feita num banco que já tem dados: linha que já
+# está lá (mesmo id e mesmo jogador) é pulada, então importar o mesmo
+# arquivo de novo não duplica nada. Jogador cujo id ou nome/ano já
+# pertence a outro jogador do banco interrompe tudo (ErroImportacao):
+# os resultados do arquivo iam parar no jogador errado.
+LOTE_IMPORTACAO = 1000
+
+COLUNAS = {
+    "jogadores": ["id", "nome", "ano", "data_criacao"],
+    "resultados": ["id", "jogador_id", "categoria", "acertou", "data_criacao"],
+}
+
+CONSULTAS_EXPORTACAO = {
+    "jogadores": """
+        SELECT id, nome, ano, data_criacao, NULL AS data FROM jogadores
+        {filtro} ORDER BY id
+    """,
+    # nome, ano e data vão junto para a planilha ficar legível; a importação ignora
+    "resultados": """
+        SELECT r.id, r.jogador_id, r.categoria, r.acertou, r.data_criacao, NULL AS data, j.nome, j.ano
+        FROM resultados r
+        LEFT JOIN jogadores j ON j.id = r.jogador_id
+        {filtro} ORDER BY r.id
+    """,
+}
+
+
+def exportar(tabela, formato, saida, ano=None):
+    """Escreve a tabela em `saida` (arquivo texto aberto) e devolve quantas linhas saíram."""
+    filtro, parametros = "", ()
+    if ano is not None:
+        filtro = "WHERE ano = ?" if tabela == "jogadores" else "WHERE j.ano = ?"
+        parametros = (ano,)
+
+    linhas = 0
+    with conexao() as conn:
+        cursor = conn.execute(CONSULTAS_EXPORTACAO[tabela].format(filtro=filtro), parametros)
+        colunas = [d[0] for d in cursor.description]
+        indice_criacao, indice_data = colunas.index("data_criacao"), colunas.index("data")
+        escritor = csv.writer(saida) if formato == "csv" else None
+        if escritor:
+            escritor.writerow(colunas)
+
+        for linha in cursor:  # itera no cursor, sem fetchall()
+            linha = list(linha)
+            linha[indice_data] = formatar_data(linha[indice_criacao])
+            if escritor:
+                escritor.writerow(linha)
+            else:
+                saida.write(json.dumps(dict(zip(colunas, linha)), ensure_ascii=False) + "\n")
+            linhas += 1
+    return linhas
+
+
+def _ler_registros(formato, entrada):
+    if formato == "csv":
+        yield from csv.DictReader(entrada)
+    else:
+        for linha in entrada:
+            if linha.strip():
+                yield json.loads(linha)
+
+
+def _jogadores_novos(conn, lote):
+    """Tira do lote os jogadores que já estão no banco; erro se algum conflita."""
+    novos = []
+    for valores in lote:
+        jogador_id, nome, ano, _, nome_chave = valores
+        existentes = conn.execute("""
+            SELECT id, nome_chave, ano FROM jogadores
+            WHERE id = ? OR (nome_chave = ? AND ano = ?)
+        """, (jogador_id, nome_chave, ano)).fetchall()
+        if not existentes:
+            novos.append(valores)
+        elif jogador_id is not None and existentes != [(jogador_id, nome_chave, ano)]:
+            raise ErroImportacao(
+                f"jogador {jogador_id} ({nome}, {ano}) conflita com {existentes} já no banco; "
+                "importe num banco vazio ou acerte os ids no arquivo"
+            )
+    return novos
+
+
+def importar(tabela, formato, entrada):
+    """Lê registros de `entrada` e insere em lotes; devolve (importadas, já existentes)."""
+    colunas = COLUNAS[tabela]
+    colunas_sql = colunas + ["nome_chave"] if tabela == "jogadores" else colunas
+    sql = (f"INSERT INTO {tabela} ({', '.join(colunas_sql)}) VALUES ({', '.join('?' * len(colunas_sql))}) "
+           "ON CONFLICT(id) DO NOTHING")
+
+    def tuplas():
+        for registro in _ler_registros(formato, entrada):
+            valores = []
+            for coluna in colunas:
+                valor = registro.get(coluna)
+                if valor == "":
+                    valor = None
+                if coluna == "data_criacao":
+                    valor = ler_data(valor)
+                elif coluna in ("id", "jogador_id", "acertou") and valor is not None:
+                    valor = int(valor)
+                valores.append(valor)
+            if tabela == "jogadores":
+                # mesma limpeza do registrar_jogador, senão o mesmo aluno vira dois
+                valores[1] = " ".join((valores[1] or "").split())
+                valores[2] = (valores[2] or "").strip()
+                valores.append(normalizar_nome(valores[1]))
+            yield tuple(valores)
+
+    importadas = existentes = 0
+    registros = tuplas()
+    with conexao() as conn:
+        conn.execute("BEGIN IMMEDIATE")
+        while True:
+            lote = list(islice(registros, LOTE_IMPORTACAO))
+            if not lote:
+                break
+            novos = _jogadores_novos(conn, lote) if tabela == "jogadores" else lote
+            # rowcount não conta o que os triggers dos totais mudaram
+            inseridas = conn.executemany(sql, novos).rowcount if novos else 0
+            importadas += inseridas
+            existentes += len(lote) - inseridas
+    return importadas, existentes
+
+
+def _formato(caminho, padrao="csv"):
+    if caminho and caminho.endswith(".jsonl"):
+        return "jsonl"
+    return padrao
+
+
+if __name__ == "__main__":
+    # uso: python exportar.py exportar jogadores|resultados [arquivo.csv|arquivo.jsonl] [--ano 5]
+    #      python exportar.py importar jogadores|resultados arquivo.csv|arquivo.jsonl
+    argumentos = sys.argv[1:]
+    ano = None
+    if "--ano" in argumentos:
+        posicao = argumentos.index("--ano")
+        ano = argumentos[posicao + 1]
+        del argumentos[posicao:posicao + 2]
+    if len(argumentos) < 2 or argumentos[0] not in ("exportar", "importar") or argumentos[1] not in COLUNAS:
+        print("uso: python exportar.py exportar|importar jogadores|resultados [arquivo] [--ano ANO]")
+        sys.exit(1)
+
+    comando, tabela = argumentos[0], argumentos[1]
+    caminho = argumentos[2] if len(argumentos) > 2 else None
+    if comando == "exportar":
+        if caminho:
+            with open(caminho, "w", newline="", encoding="utf-8") as saida:
+                total = exportar(tabela, _formato(caminho), saida, ano)
+        else:
+            total = exportar(tabela, "csv", sys.stdout, ano)
+        print(f"📤 {total} linhas de {tabela} exportadas", file=sys.stderr)
+    else:
+        try:
+            with open(caminho, newline="", encoding="utf-8") as entrada:
+                total, existentes = importar(tabela, _formato(caminho), entrada)
+        except ValueError as e:  # ErroImportacao ou valor que não é número
+            print(f"⚠ Nada foi importado: {e}", file=sys.stderr)
+            sys.exit(1)
+        print(f"📥 {total} linhas de {tabela} importadas ({existentes} já estavam no banco)", file=sys.stderr)
@@ -0,0 +1,293 @@
+import os
+import pty
+import sys
+import json
+import time
+import select
+import struct
+import datetime
+
+try:
+    # gravação acontece também nas threads do tpool: precisa de trava de verdade
+    from eventlet.patcher import original
+    threading_real = original("threading")
+except ImportError:
+    import threading as threading_real
+
+from protocolo_serial import DecodificadorQuadros, TIPO_HELLO_OK
+
+# ===============================
+# 🔹 GRAVAÇÃO DO TRÁFEGO SERIAL
+# ===============================
+# Com GRAVAR_SERIAL ligado no py16.py, cada conexão com um Arduino grava
+# todos os bytes que entram e saem num arquivo .serial, com o instante
+# (relógio monotônico, em µs desde a abertura da porta). Serve para
+# reproduzir depois, em casa, um problema que só aconteceu no evento.
+#
+# Arquivo: linha "SERIAL1", linha JSON com os dados da conexão e depois
+# registros struct "<QcH" (µs, tipo, tamanho) seguidos dos bytes.
+#   "<"  entrada: Arduino -> servidor
+#   ">"  saída:   servidor -> Arduino
+#   "B"  troca de baud (bytes = baud em texto)
+ASSINATURA = b"SERIAL1\n"
+REGISTRO = struct.Struct("<QcH")
+ENTRADA, SAIDA, BAUD = b"<", b">", b"B"
+EXTENSAO = ".serial"
+ESPERA_MAXIMA_SAIDA = 2.0  # s esperando o servidor mandar o que mandou na gravação
+
+
+class GravadorSerial:
+    def __init__(self, caminho, **metadados):
+        self.caminho = caminho
+        self._arquivo = open(caminho, "wb")
+        self._trava = threading_real.Lock()
+        self._inicio = time.monotonic()
+        metadados.setdefault("inicio", datetime.datetime.now().isoformat(timespec="seconds"))
+        self._arquivo.write(ASSINATURA)
+        self._arquivo.write(json.dumps(metadados, ensure_ascii=False).encode() + b"\n")
+        self._arquivo.flush()
+
+    def registrar(self, tipo, dados):
+        microssegundos = int((time.monotonic() - self._inicio) * 1_000_000)
+        with self._trava:
+            if self._arquivo.closed:
+                return
+            self._arquivo.write(REGISTRO.pack(microssegundos, tipo, len(dados)))
+            self._arquivo.write(dados)
+            # vai para o disco já: servidor derrubado não pode levar a gravação junto
+            self._arquivo.flush()
+
+    def fechar(self):
+        with self._trava:
+            if not self._arquivo.closed:
+                self._arquivo.close()
+
+
+class PortaGravada:
+    """Porta serial que grava no GravadorSerial tudo o que lê e escreve.
+
+    O resto (in_waiting, fileno, timeout...) passa direto para a porta.
+    """
+
+    def __init__(self, porta, gravador):
+        object.__setattr__(self, "_porta", porta)
+        object.__setattr__(self, "gravador", gravador)
+
+    def read(self, *args):
+        dados = self._porta.read(*args)
+        if dados:
+            self.gravador.registrar(ENTRADA, dados)
+        return dados
+
+    def write(self, dados):
+        self.gravador.registrar(SAIDA, bytes(dados))
+        return self._porta.write(dados)
+
+    def close(self):
+        self.gravador.fechar()
+        self._porta.close()
+
+    def __getattr__(self, nome):
+        return getattr(self._porta, nome)
+
+    def __setattr__(self, nome, valor):
+        if nome == "baudrate":
+            self.gravador.registrar(BAUD, str(valor).encode())
+        setattr(self._porta, nome, valor)
+
+
+def abrir_gravacao(pasta, quiosque_id, porta, baud):
+    """Gravador novo em pasta/quiosque-<id>-<data>.serial."""
+    os.makedirs(pasta, exist_ok=True)
+    nome = f"quiosque-{quiosque_id}-{datetime.datetime.now():%Y%m%d-%H%M%S}{EXTENSAO}"
+    return GravadorSerial(os.path.join(pasta, nome), quiosque=quiosque_id, porta=porta, baud=baud)
+
+
+def ler_gravacao(caminho):
+    """Devolve (metadados, [(segundos, tipo, bytes)])."""
+    with open(caminho, "rb") as arquivo:
+        if arquivo.readline() != ASSINATURA:
+            raise ValueError(f"{caminho} não é uma gravação serial")
+        metadados = json.loads(arquivo.readline())
+        registros = []
+        while True:
+            cabecalho = arquivo.read(REGISTRO.size)
+            if len(cabecalho) < REGISTRO.size:
+                break  # fim (ou gravação cortada no meio de um registro)
+            microssegundos, tipo, tamanho = REGISTRO.unpack(cabecalho)
+            dados = arquivo.read(tamanho)
+            if len(dados) < tamanho:
+                break
+            registros.append((microssegundos / 1_000_000, tipo, dados))
+    return metadados, registros
+
+
+# ===============================
+# 🔹 REPRODUÇÃO
+# ===============================
+# `repetir` faz o papel do Arduino num pseudo-terminal (como o
+# arduino_virtual.py): o servidor abre o caminho do pty como porta e recebe
+# os bytes de entrada nos mesmos intervalos da gravação (ou `velocidade`
+# vezes mais rápido; 0 = sem esperar). Para a ordem ser a mesma, cada
+# resposta gravada só sai depois que o servidor mandou o que tinha mandado
+# antes dela (HELLO antes do HELLO_OK, COMANDO antes do ACK), esperando
+# até ESPERA_MAXIMA_SAIDA. A primeira saída é esperada sem limite: o
+# servidor pode levar bem mais que isso para subir e abrir a porta (e
+# ainda espera o boot do Arduino antes do HELLO). No fim compara a saída
+# do servidor com a gravada.
+def repetir(caminho, velocidade=1.0, link=None, esperar_saida=True, mostrar=True):
+    metadados, registros = ler_gravacao(caminho)
+    mestre, escravo = pty.openpty()
+    porta = os.ttyname(escravo)
+    if link:
+        if os.path.lexists(link):
+            os.remove(link)
+        os.symlink(porta, link)
+    if mostrar:
+        print(f"▶ Repetindo {caminho} ({metadados.get('inicio')}, quiosque {metadados.get('quiosque')}) "
+              f"em {link or porta}, velocidade {velocidade or 'máxima'}")
+
+    saida_recebida = bytearray()
+    parar = threading_real.Event()
+
+    def ler_saida():
+        while not parar.is_set():
+            if select.select([mestre], [], [], 0.05)[0]:
+                try:
+                    saida_recebida.extend(os.read(mestre, 4096))
+                except OSError:
+                    break
+
+    threading_real.Thread(target=ler_saida, daemon=True).start()
+
+    saida_gravada = bytearray()
+    resultado = {"entrada_bytes": 0, "saida_gravada": 0, "saida_recebida": 0,
+                 "esperas_estouradas": 0, "saida_igual": None}
+    referencia_real, referencia_gravada = time.monotonic(), 0.0
+    primeira_saida = True
+    try:
+        for instante, tipo, dados in registros:
+            if tipo == SAIDA:
+                saida_gravada.extend(dados)
+                if esperar_saida:
+                    if primeira_saida and mostrar and len(saida_recebida) < len(saida_gravada):
+                        print("⏳ Esperando o servidor abrir a porta...")
+                    limite = None if primeira_saida else time.monotonic() + ESPERA_MAXIMA_SAIDA
+                    primeira_saida = False
+                    while len(saida_recebida) < len(saida_gravada) and (limite is None or time.monotonic() < limite):
+                        time.sleep(0.001)
+                    if len(saida_recebida) < len(saida_gravada):
+                        resultado["esperas_estouradas"] += 1
+                    # o tempo volta a contar a partir desta saída
+                    referencia_real, referencia_gravada = time.monotonic(), instante
+                continue
+            if tipo != ENTRADA:
+                continue
+            if velocidade:
+                espera = referencia_real + (instante - referencia_gravada) / velocidade - time.monotonic()
+                if espera > 0:
+                    time.sleep(espera)
+            os.write(mestre, dados)
+            resultado["entrada_bytes"] += len(dados)
+        time.sleep(0.2)  # dá tempo do servidor responder ao último byte
+    finally:
+        parar.set()
+        if link and os.path.lexists(link):
+            os.remove(link)
+
+    resultado["saida_gravada"] = len(saida_gravada)
+    resultado["saida_recebida"] = len(saida_recebida)
+    resultado["saida_igual"] = bytes(saida_recebida) == bytes(saida_gravada)
+    if not resultado["saida_igual"]:
+        diferenca = next(
+            (i for i, (a, b) in enumerate(zip(saida_recebida, saida_gravada)) if a != b),
+            min(len(saida_recebida), len(saida_gravada)),
+        )
+        resultado["primeira_diferenca"] = diferenca
+    return resultado
+
+
+# ===============================
+# 🔹 BANCADA
+# ===============================
+# Passa a entrada gravada pelo LeitorSerial da ponte, sem serial nem
+# servidor, o mais rápido possível: mede quanto a ponte aguenta de tráfego
+# real (linhas e quadros por segundo).
+class _PortaNula:
+    def write(self, dados):
+        return len(dados)
+
+
+def medir(caminho, repeticoes=100):
+    from ponte_serial import LeitorSerial
+
+    _, registros = ler_gravacao(caminho)
+    entradas = [dados for _, tipo, dados in registros if tipo == ENTRADA]
+    linhas = 0
+
+    def contar(linha, instante):
+        nonlocal linhas
+        linhas += 1
+
+    inicio = time.perf_counter()
+    for _ in range(repeticoes):
+        # começa no texto e passa para quadros depois do HELLO_OK, como a ponte
+        leitor = LeitorSerial(_PortaNula(), contar)
+        sonda = DecodificadorQuadros()
+        for dados in entradas:
+            leitor.processar(dados)
+            if leitor.decodificador is None and any(
+                tipo == TIPO_HELLO_OK for tipo, _, _ in sonda.alimentar(dados)
+            ):
+                leitor.decodificador = DecodificadorQuadros()
+    duracao = time.perf_counter() - inicio
+    total_bytes = sum(map(len, entradas)) * repeticoes
+    return {
+        "repeticoes": repeticoes,
+        "pedacos": len(entradas) * repeticoes,
+        "bytes": total_bytes,
+        "linhas": linhas,
+        "segundos": round(duracao, 3),
+        "linhas_por_s": round(linhas / duracao) if duracao else None,
+        "bytes_por_s": round(total_bytes / duracao) if duracao else None,
+    }
+
+
+def mostrar(caminho):
+    metadados, registros = ler_gravacao(caminho)
+    print(json.dumps(metadados, ensure_ascii=False))
+    for instante, tipo, dados in registros:
+        texto = dados.decode(errors="replace") if all(32 <= b < 127 or b in (10, 13) for b in dados) else dados.hex(" ")
+        print(f"{instante:12.6f} {tipo.decode()} {texto!r}")
+
+
+if __name__ == "__main__":
+    # uso: python gravacao_serial.py mostrar arquivo.serial
+    #      python gravacao_serial.py repetir arquivo.serial [--velocidade 10] [--link /tmp/arduino] [--sem-esperar]
+    #      python gravacao_serial.py medir arquivo.serial [--repeticoes 100]
+    argumentos = sys.argv[1:]
+
+    def opcao(nome, padrao=None):
+        if nome in argumentos:
+            posicao = argumentos.index(nome)
+            valor = argumentos[posicao + 1]
+            del argumentos[posicao:posicao + 2]
+            return valor
+        return padrao
+
+    velocidade = float(opcao("--velocidade", "1"))
+    link = opcao("--link")
+    repeticoes = int(opcao("--repeticoes", "100"))
+    esperar = "--sem-esperar" not in argumentos
+    argumentos = [a for a in argumentos if a != "--sem-esperar"]
+    if len(argumentos) < 2 or argumentos[0] not in ("mostrar", "repetir", "medir"):
+        print("uso: python gravacao_serial.py mostrar|repetir|medir arquivo.serial [opções]")
+        sys.exit(1)
+
+    comando, caminho = argumentos[0], argumentos[1]
+    if comando == "mostrar":
+        mostrar(caminho)
+    elif comando == "repetir":
+        print(repetir(caminho, velocidade, link, esperar))
+    else:
+        print(medir(caminho, repeticoes))
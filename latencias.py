@@ -0,0 +1,147 @@
+import json
+import time
+import bisect
+import threading
+from collections import OrderedDict
+
+# ===============================
+# 🔹 LATÊNCIA DE CADA ETAPA DO APERTO
+# ===============================
+# Do botão físico até o resultado gravado no banco, cada etapa tem o seu
+# histograma (em ms). Todos os instantes são do relógio do servidor
+# (time.perf_counter), então não depende do relógio do navegador. A hora
+# do aperto vem da idade que o Arduino manda no quadro BOTAO (no protocolo
+# de texto é a hora em que a linha chegou).
+#
+#   aperto_serial    botão apertado -> linha chegou da serial
+#   serial_emit      linha chegou da serial -> socketio.emit('botao') feito
+#   emit_navegador   emit -> navegador avisa que recebeu (ida e volta na rede)
+#   aperto_resposta  botão apertado -> 'acertou'/'errou' do navegador
+#   resposta_commit  'acertou'/'errou' -> resultado gravado (commit do lote)
+#   aperto_commit    botão apertado -> resultado gravado (total)
+#   comando_arduino  comando na fila -> escrito na serial (confirmado no binário)
+#
+# Cada etapa fica no total e separada por quiosque, para achar o quiosque
+# lento e ver se o problema é a serial, a rede ou o banco.
+ETAPAS = (
+    "aperto_serial",
+    "serial_emit",
+    "emit_navegador",
+    "aperto_resposta",
+    "resposta_commit",
+    "aperto_commit",
+    "comando_arduino",
+)
+# faixas em escala logarítmica: 4 por oitava, de 0,05 ms até ~52 s
+LIMITES_MS = [0.05 * 2 ** (i / 4) for i in range(81)]
+LIMITE_APERTOS = 1000  # apertos recentes lembrados para casar as etapas
+ARQUIVO_LATENCIAS = "latencias.json"
+
+
+def agora():
+    return time.perf_counter()
+
+
+class Histograma:
+    """Contagem por faixa de latência; percentis com erro de uma faixa (~19%)."""
+
+    def __init__(self):
+        self.contagens = [0] * (len(LIMITES_MS) + 1)
+        self.total = 0
+        self.soma = 0.0
+        self.minimo = None
+        self.maximo = None
+
+    def registrar(self, ms):
+        self.contagens[bisect.bisect_left(LIMITES_MS, ms)] += 1
+        self.total += 1
+        self.soma += ms
+        self.minimo = ms if self.minimo is None else min(self.minimo, ms)
+        self.maximo = ms if self.maximo is None else max(self.maximo, ms)
+
+    def percentil(self, p):
+        if not self.total:
+            return None
+        alvo = p / 100 * self.total
+        acumulado = 0
+        for faixa, contagem in enumerate(self.contagens):
+            acumulado += contagem
+            if acumulado >= alvo and contagem:
+                limite = LIMITES_MS[faixa] if faixa < len(LIMITES_MS) else self.maximo
+                return round(min(limite, self.maximo), 3)
+        return round(self.maximo, 3)
+
+    def resumo(self):
+        return {
+            "n": self.total,
+            "p50": self.percentil(50),
+            "p95": self.percentil(95),
+            "p99": self.percentil(99),
+            "media": round(self.soma / self.total, 3) if self.total else None,
+            "min": round(self.minimo, 3) if self.minimo is not None else None,
+            "max": round(self.maximo, 3) if self.maximo is not None else None,
+        }
+
+
+class RegistroLatencias:
+    def __init__(self):
+        self._trava = threading.Lock()
+        self.zerar()
+
+    def zerar(self):
+        with self._trava:
+            self.etapas = {etapa: Histograma() for etapa in ETAPAS}
+            self.por_quiosque = {}
+            self.desde = time.time()
+
+    def registrar(self, etapa, inicio, fim=None, quiosque=None):
+        """Registra fim - inicio (segundos do perf_counter) na etapa."""
+        ms = ((fim if fim is not None else agora()) - inicio) * 1000
+        with self._trava:
+            self.etapas[etapa].registrar(ms)
+            if quiosque is not None:
+                etapas = self.por_quiosque.setdefault(str(quiosque), {})
+                etapas.setdefault(etapa, Histograma()).registrar(ms)
+
+    def resumo(self):
+        with self._trava:
+            return {
+                "desde": int(self.desde * 1000),
+                "etapas": {etapa: h.resumo() for etapa, h in self.etapas.items()},
+                "por_quiosque": {
+                    quiosque: {etapa: h.resumo() for etapa, h in etapas.items()}
+                    for quiosque, etapas in self.por_quiosque.items()
+                },
+            }
+
+    def despejar(self, caminho=ARQUIVO_LATENCIAS):
+        with open(caminho, "w", encoding="utf-8") as arquivo:
+            json.dump(self.resumo(), arquivo, ensure_ascii=False, indent=2)
+        return caminho
+
+
+class Apertos:
+    """Instantes de cada aperto (botão apertado, emit...), pelo id mandado ao navegador."""
+
+    def __init__(self, limite=LIMITE_APERTOS):
+        self.limite = limite
+        self._itens = OrderedDict()
+        self._proximo = 0
+
+    def novo(self, quiosque_id, instante):
+        self._proximo += 1
+        self._itens[self._proximo] = {"quiosque": quiosque_id, "apertado": instante}
+        if len(self._itens) > self.limite:
+            self._itens.popitem(last=False)
+        return self._proximo
+
+    def pegar(self, aperto_id):
+        """Instantes do aperto, ou None se o id é desconhecido ou antigo demais."""
+        try:
+            return self._itens.get(int(aperto_id))
+        except (TypeError, ValueError):
+            return None
+
+
+latencias = RegistroLatencias()
+apertos = Apertos()
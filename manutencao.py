@@ -0,0 +1,140 @@
+import os
+import sys
+import json
+import sqlite3
+
+import banco
+from banco import ESPERA_TRAVA, agora_ms, estatisticas_trava, threading_real, time_real
+from migracoes import CONSULTAS_QUENTES, migrar
+
+# ===============================
+# 🔹 MANUTENÇÃO DO BANCO
+# ===============================
+# VACUUM incremental, ANALYZE e checkpoint do WAL, para o quiz.db não ir
+# ficando fragmentado e lento numa feira de vários dias. Cada rodada fica
+# registrada na tabela manutencoes com o tamanho do arquivo e o tempo das
+# consultas quentes antes e depois.
+#
+# Roda numa thread de verdade com conexão própria (não usa o pool), então
+# não trava o eventlet. Pelo agendador, só roda quando o banco está ocioso.
+INTERVALO_MANUTENCAO = 30 * 60  # segundos entre tentativas
+OCIOSO_POR = 120                # segundos sem gravação para considerar ocioso
+PAGINAS_POR_VEZ = 2000          # páginas livres devolvidas por rodada
+REPETICOES_TEMPO = 20           # execuções de cada consulta para medir o tempo
+
+
+def _tamanho(arquivo):
+    total = 0
+    for caminho in (arquivo, arquivo + "-wal"):
+        if os.path.exists(caminho):
+            total += os.path.getsize(caminho)
+    return total
+
+
+def _tempos_consultas(conn):
+    tempos = {}
+    for consulta, parametros, _ in CONSULTAS_QUENTES:
+        inicio = time_real.perf_counter()
+        for _ in range(REPETICOES_TEMPO):
+            conn.execute(consulta, parametros).fetchall()
+        tempos[consulta] = round((time_real.perf_counter() - inicio) * 1000 / REPETICOES_TEMPO, 3)
+    return tempos
+
+
+def executar_manutencao(arquivo=None, paginas=PAGINAS_POR_VEZ):
+    """Faz uma rodada de manutenção e devolve o registro gravado."""
+    arquivo = arquivo or banco.ARQUIVO_BANCO
+    conn = sqlite3.connect(arquivo, timeout=ESPERA_TRAVA, isolation_level=None)
+    try:
+        inicio = agora_ms()
+        relogio = time_real.monotonic()
+        registro = {
+            "inicio": inicio,
+            "tamanho_antes": _tamanho(arquivo),
+            "paginas_livres_antes": conn.execute("PRAGMA freelist_count").fetchone()[0],
+            "consultas_antes": _tempos_consultas(conn),
+        }
+
+        if conn.execute("PRAGMA auto_vacuum").fetchone()[0] != 2:
+            # banco antigo: precisa de um VACUUM completo para virar incremental
+            conn.execute("PRAGMA auto_vacuum=INCREMENTAL")
+            conn.execute("VACUUM")
+        else:
+            # executescript roda o PRAGMA até o fim (execute libera só uma página)
+            conn.executescript(f"PRAGMA incremental_vacuum({int(paginas)});")
+        conn.execute("ANALYZE")
+        conn.execute("PRAGMA wal_checkpoint(TRUNCATE)").fetchone()
+
+        registro.update(
+            duracao_ms=int((time_real.monotonic() - relogio) * 1000),
+            tamanho_depois=_tamanho(arquivo),
+            paginas_livres_depois=conn.execute("PRAGMA freelist_count").fetchone()[0],
+            consultas_depois=_tempos_consultas(conn),
+        )
+        conn.execute("""
+            INSERT INTO manutencoes (inicio, duracao_ms, tamanho_antes, tamanho_depois,
+                paginas_livres_antes, paginas_livres_depois, consultas_antes, consultas_depois)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+        """, (
+            registro["inicio"], registro["duracao_ms"],
+            registro["tamanho_antes"], registro["tamanho_depois"],
+            registro["paginas_livres_antes"], registro["paginas_livres_depois"],
+            json.dumps(registro["consultas_antes"]), json.dumps(registro["consultas_depois"]),
+        ))
+        return registro
+    finally:
+        conn.close()
+
+
+def ultimas_manutencoes(limite=10):
+    with banco.conexao() as conn:
+        linhas = conn.execute("""
+            SELECT inicio, duracao_ms, tamanho_antes, tamanho_depois,
+                   paginas_livres_antes, paginas_livres_depois, consultas_antes, consultas_depois
+            FROM manutencoes ORDER BY id DESC LIMIT ?
+        """, (limite,)).fetchall()
+    return [
+        {
+            "inicio": banco.formatar_data(l[0]), "duracao_ms": l[1],
+            "tamanho_antes": l[2], "tamanho_depois": l[3],
+            "paginas_livres_antes": l[4], "paginas_livres_depois": l[5],
+            "consultas_antes": json.loads(l[6] or "{}"), "consultas_depois": json.loads(l[7] or "{}"),
+        }
+        for l in linhas
+    ]
+
+
+def _ocioso():
+    ultima = estatisticas_trava["ultima_escrita"]
+    return ultima is None or time_real.time() - ultima >= OCIOSO_POR
+
+
+def iniciar_agendador(intervalo=INTERVALO_MANUTENCAO):
+    def loop():
+        while True:
+            time_real.sleep(intervalo)
+            if not _ocioso():
+                continue
+            try:
+                registro = executar_manutencao()
+                print(f"🧹 Manutenção do banco: {registro['tamanho_antes'] // 1024} KB -> "
+                      f"{registro['tamanho_depois'] // 1024} KB em {registro['duracao_ms']} ms")
+            except sqlite3.Error as e:
+                print(f"⚠ Erro na manutenção do banco: {e}")
+
+    thread = threading_real.Thread(target=loop, daemon=True)
+    thread.start()
+    return thread
+
+
+if __name__ == "__main__":
+    # uso: python manutencao.py [arquivo.db]
+    arquivo = sys.argv[1] if len(sys.argv) > 1 else banco.ARQUIVO_BANCO
+    banco.pool = banco.PoolConexoes(arquivo)
+    migrar()  # garante a tabela manutencoes
+    registro = executar_manutencao(arquivo)
+    print(f"Tamanho: {registro['tamanho_antes']} -> {registro['tamanho_depois']} bytes")
+    print(f"Páginas livres: {registro['paginas_livres_antes']} -> {registro['paginas_livres_depois']}")
+    print(f"Duração: {registro['duracao_ms']} ms")
+    for consulta, antes in registro["consultas_antes"].items():
+        print(f"  {antes:.3f} ms -> {registro['consultas_depois'][consulta]:.3f} ms  {consulta}")
@@ -0,0 +1,327 @@
+import sys
+
+import banco
+from banco import conexao, normalizar_nome
+
+# ===============================
+# 🔹 MIGRAÇÕES DO BANCO
+# ===============================
+# A versão do esquema fica no PRAGMA user_version do próprio quiz.db.
+# Cada migração leva o banco de uma versão para a próxima e roda numa
+# transação só; bancos de qualquer versão antiga do projeto (criar_banco.py,
+# pycombanco.py, py16.py) chegam no mesmo esquema atual.
+
+
+def _tabelas(conn):
+    return {linha[0] for linha in conn.execute("SELECT name FROM sqlite_master WHERE type='table'")}
+
+
+def _colunas(conn, tabela):
+    return {linha[1] for linha in conn.execute(f"PRAGMA table_info({tabela})")}
+
+
+def _v1_esquema_unificado(conn):
+    tabelas = _tabelas(conn)
+
+    # criar_banco.py usava "alunos" em vez de "jogadores"
+    if "alunos" in tabelas and "jogadores" not in tabelas:
+        conn.execute("ALTER TABLE alunos RENAME TO jogadores")
+
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS jogadores (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            nome TEXT NOT NULL,
+            ano TEXT NOT NULL,
+            data_criacao TEXT
+        )
+    """)
+    if "data_criacao" not in _colunas(conn, "jogadores"):
+        conn.execute("ALTER TABLE jogadores ADD COLUMN data_criacao TEXT")
+
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS resultados (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            jogador_id INTEGER,
+            categoria TEXT,
+            acertou INTEGER,
+            data_criacao TEXT,
+            FOREIGN KEY(jogador_id) REFERENCES jogadores(id)
+        )
+    """)
+    colunas = _colunas(conn, "resultados")
+    if "aluno_id" in colunas:
+        conn.execute("ALTER TABLE resultados RENAME COLUMN aluno_id TO jogador_id")
+    if "data" in colunas and "data_criacao" not in colunas:
+        # pycombanco.py e criar_banco.py chamavam a coluna de "data"
+        conn.execute("ALTER TABLE resultados RENAME COLUMN data TO data_criacao")
+
+
+def _v2_indices(conn):
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_resultados_jogador ON resultados(jogador_id)")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_jogadores_ano ON jogadores(ano)")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_jogadores_nome_ano ON jogadores(nome, ano)")
+
+
+# ===============================
+# 🔹 TOTAIS PRÉ-CALCULADOS
+# ===============================
+# Os relatórios leem estas tabelas em vez de somar a tabela resultados
+# inteira. Triggers mantêm os totais a cada INSERT/UPDATE/DELETE, então
+# vale para qualquer caminho que grave resultados.
+ACERTOU = "CASE WHEN {0}.acertou THEN 1 ELSE 0 END"
+CATEGORIA = "COALESCE({0}.categoria, 'Sem categoria')"
+
+
+def _somar_totais(linha, sinal):
+    acertou = ACERTOU.format(linha)
+    categoria = CATEGORIA.format(linha)
+    return f"""
+        INSERT INTO totais_categoria (categoria, acertos, total)
+        VALUES ({categoria}, {sinal}{acertou}, {sinal}1)
+        ON CONFLICT(categoria) DO UPDATE SET
+            acertos = acertos + excluded.acertos, total = total + excluded.total;
+        INSERT INTO totais_jogador (jogador_id, acertos, total)
+        SELECT {linha}.jogador_id, {sinal}{acertou}, {sinal}1 WHERE {linha}.jogador_id IS NOT NULL
+        ON CONFLICT(jogador_id) DO UPDATE SET
+            acertos = acertos + excluded.acertos, total = total + excluded.total;
+        INSERT INTO totais_jogador_categoria (jogador_id, categoria, acertos, total)
+        SELECT {linha}.jogador_id, {categoria}, {sinal}{acertou}, {sinal}1 WHERE {linha}.jogador_id IS NOT NULL
+        ON CONFLICT(jogador_id, categoria) DO UPDATE SET
+            acertos = acertos + excluded.acertos, total = total + excluded.total;
+    """
+
+
+def reconstruir_totais(conn):
+    """Recalcula os totais a partir das linhas de resultados."""
+    acertou = ACERTOU.format("r")
+    categoria = CATEGORIA.format("r")
+    conn.execute("DELETE FROM totais_categoria")
+    conn.execute("DELETE FROM totais_jogador")
+    conn.execute("DELETE FROM totais_jogador_categoria")
+    conn.execute(f"""
+        INSERT INTO totais_categoria (categoria, acertos, total)
+        SELECT {categoria}, SUM({acertou}), COUNT(*) FROM resultados r GROUP BY 1
+    """)
+    conn.execute(f"""
+        INSERT INTO totais_jogador (jogador_id, acertos, total)
+        SELECT r.jogador_id, SUM({acertou}), COUNT(*) FROM resultados r
+        WHERE r.jogador_id IS NOT NULL GROUP BY 1
+    """)
+    conn.execute(f"""
+        INSERT INTO totais_jogador_categoria (jogador_id, categoria, acertos, total)
+        SELECT r.jogador_id, {categoria}, SUM({acertou}), COUNT(*) FROM resultados r
+        WHERE r.jogador_id IS NOT NULL GROUP BY 1, 2
+    """)
+
+
+def _v3_totais(conn):
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS totais_jogador (
+            jogador_id INTEGER PRIMARY KEY,
+            acertos INTEGER NOT NULL DEFAULT 0,
+            total INTEGER NOT NULL DEFAULT 0
+        )
+    """)
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS totais_categoria (
+            categoria TEXT PRIMARY KEY,
+            acertos INTEGER NOT NULL DEFAULT 0,
+            total INTEGER NOT NULL DEFAULT 0
+        )
+    """)
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS totais_jogador_categoria (
+            jogador_id INTEGER NOT NULL,
+            categoria TEXT NOT NULL,
+            acertos INTEGER NOT NULL DEFAULT 0,
+            total INTEGER NOT NULL DEFAULT 0,
+            PRIMARY KEY (jogador_id, categoria)
+        )
+    """)
+    conn.execute(f"""
+        CREATE TRIGGER IF NOT EXISTS trg_totais_insert AFTER INSERT ON resultados
+        BEGIN {_somar_totais("NEW", "")} END
+    """)
+    conn.execute(f"""
+        CREATE TRIGGER IF NOT EXISTS trg_totais_delete AFTER DELETE ON resultados
+        BEGIN {_somar_totais("OLD", "-")} END
+    """)
+    conn.execute(f"""
+        CREATE TRIGGER IF NOT EXISTS trg_totais_update
+        AFTER UPDATE OF jogador_id, categoria, acertou ON resultados
+        BEGIN {_somar_totais("OLD", "-")} {_somar_totais("NEW", "")} END
+    """)
+    reconstruir_totais(conn)
+
+
+def _data_em_utc(conn, tabela):
+    """True se a data_criacao da tabela foi preenchida pelo DEFAULT CURRENT_TIMESTAMP.
+
+    É o caso da coluna "data" do criar_banco.py antigo (tabela alunos /
+    aluno_id): o SQLite grava CURRENT_TIMESTAMP já em UTC. A v1 só renomeia
+    a coluna, então o DEFAULT continua lá e marca essa origem.
+    """
+    for linha in conn.execute(f"PRAGMA table_info({tabela})"):
+        if linha[1] == "data_criacao":
+            return (linha[4] or "").upper() == "CURRENT_TIMESTAMP"
+    return False
+
+
+def _v4_datas_inteiras(conn):
+    # data_criacao era TEXT "AAAA-MM-DD HH:MM:SS" (hora local, ou UTC no
+    # layout do criar_banco.py); vira INTEGER em milissegundos UTC. Coluna
+    # TEXT guardaria o número como texto, por isso cria uma coluna nova,
+    # converte tudo num UPDATE só e troca.
+    for tabela in ("jogadores", "resultados"):
+        # 'utc' converte de hora local para UTC; data já em UTC não leva
+        modificador = "" if _data_em_utc(conn, tabela) else ", 'utc'"
+        conn.execute(f"ALTER TABLE {tabela} ADD COLUMN data_ms INTEGER")
+        conn.execute(f"""
+            UPDATE {tabela}
+            SET data_ms = CAST(strftime('%s', data_criacao{modificador}) AS INTEGER) * 1000
+            WHERE data_criacao IS NOT NULL
+        """)
+        conn.execute(f"ALTER TABLE {tabela} DROP COLUMN data_criacao")
+        conn.execute(f"ALTER TABLE {tabela} RENAME COLUMN data_ms TO data_criacao")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_resultados_data ON resultados(data_criacao)")
+
+
+def mesclar_duplicados(conn):
+    """Junta jogadores com o mesmo nome normalizado e ano no de menor id.
+
+    Os resultados dos repetidos passam para o que fica (o trigger de UPDATE
+    acerta os totais) e as linhas repetidas são apagadas. Devolve quantos
+    jogadores foram removidos.
+    """
+    conn.execute("""
+        CREATE TEMP TABLE mesclagem AS
+        SELECT j.id AS antigo, m.id AS novo
+        FROM jogadores j
+        JOIN (SELECT MIN(id) AS id, nome_chave, ano FROM jogadores GROUP BY nome_chave, ano) m
+          ON m.nome_chave = j.nome_chave AND m.ano = j.ano
+        WHERE j.id <> m.id
+    """)
+    try:
+        conn.execute("""
+            UPDATE resultados
+            SET jogador_id = (SELECT novo FROM mesclagem WHERE antigo = resultados.jogador_id)
+            WHERE jogador_id IN (SELECT antigo FROM mesclagem)
+        """)
+        removidos = conn.execute("DELETE FROM jogadores WHERE id IN (SELECT antigo FROM mesclagem)").rowcount
+        conn.execute("DELETE FROM totais_jogador WHERE jogador_id IN (SELECT antigo FROM mesclagem)")
+        conn.execute("DELETE FROM totais_jogador_categoria WHERE jogador_id IN (SELECT antigo FROM mesclagem)")
+    finally:
+        conn.execute("DROP TABLE temp.mesclagem")
+    return removidos
+
+
+def _v5_jogador_unico(conn):
+    # cada (nome, ano) vira um jogador só; nome_chave ignora espaços e maiúsculas
+    conn.execute("ALTER TABLE jogadores ADD COLUMN nome_chave TEXT")
+    conn.executemany(
+        "UPDATE jogadores SET nome_chave = ?, ano = ? WHERE id = ?",
+        ((normalizar_nome(nome), (ano or "").strip(), id_) for id_, nome, ano
+         in conn.execute("SELECT id, nome, ano FROM jogadores").fetchall()),
+    )
+    mesclar_duplicados(conn)
+    conn.execute("CREATE UNIQUE INDEX IF NOT EXISTS idx_jogadores_chave ON jogadores(nome_chave, ano)")
+
+
+def _v6_registro_manutencao(conn):
+    # histórico das manutenções (manutencao.py): tamanho e tempo das consultas
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS manutencoes (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            inicio INTEGER NOT NULL,
+            duracao_ms INTEGER,
+            tamanho_antes INTEGER,
+            tamanho_depois INTEGER,
+            paginas_livres_antes INTEGER,
+            paginas_livres_depois INTEGER,
+            consultas_antes TEXT,
+            consultas_depois TEXT
+        )
+    """)
+
+
+MIGRACOES = [
+    _v1_esquema_unificado,
+    _v2_indices,
+    _v3_totais,
+    _v4_datas_inteiras,
+    _v5_jogador_unico,
+    _v6_registro_manutencao,
+]
+
+
+def versao_atual(conn):
+    return conn.execute("PRAGMA user_version").fetchone()[0]
+
+
+def migrar():
+    """Aplica as migrações que faltam e devolve a versão final do banco."""
+    with conexao() as conn:
+        versao = versao_atual(conn)
+        for numero, migracao in enumerate(MIGRACOES, start=1):
+            if numero <= versao:
+                continue
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                migracao(conn)
+                conn.execute(f"PRAGMA user_version = {numero}")
+                conn.commit()
+            except Exception:
+                conn.rollback()
+                raise
+            print(f"🛠 Banco migrado para a versão {numero} ({migracao.__name__})")
+            versao = numero
+    return versao
+
+
+# ===============================
+# 🔹 VERIFICAÇÃO DOS ÍNDICES
+# ===============================
+# consultas do dia a dia e o índice que cada uma precisa usar
+CONSULTAS_QUENTES = [
+    ("SELECT categoria, acertou FROM resultados WHERE jogador_id=?", (1,), "idx_resultados_jogador"),
+    ("SELECT id, nome FROM jogadores WHERE ano = ?", ("1",), "idx_jogadores_ano"),
+    ("SELECT id, nome FROM jogadores WHERE ano = ? AND id > ? ORDER BY id LIMIT ?", ("1", 0, 50), "idx_jogadores_ano"),
+    ("SELECT id FROM jogadores WHERE nome=? AND ano=?", ("a", "1"), "idx_jogadores_nome_ano"),
+    ("SELECT id FROM jogadores WHERE nome_chave=? AND ano=?", ("a", "1"), "idx_jogadores_chave"),
+]
+
+
+def verificar_planos():
+    """Roda EXPLAIN QUERY PLAN nas consultas quentes.
+
+    Devolve uma lista (consulta, plano, ok); ok é False quando a consulta
+    não usa o índice esperado (ou seja, faz SCAN na tabela inteira).
+    """
+    verificacoes = []
+    with conexao() as conn:
+        for consulta, parametros, indice in CONSULTAS_QUENTES:
+            plano = " | ".join(
+                linha[-1] for linha in conn.execute("EXPLAIN QUERY PLAN " + consulta, parametros)
+            )
+            verificacoes.append((consulta, plano, indice in plano))
+    return verificacoes
+
+
+if __name__ == "__main__":
+    # uso: python migracoes.py [--reconstruir-totais] [--mesclar-duplicados] [arquivo.db]
+    argumentos = sys.argv[1:]
+    reconstruir = "--reconstruir-totais" in argumentos
+    mesclar = "--mesclar-duplicados" in argumentos
+    argumentos = [a for a in argumentos if not a.startswith("--")]
+    if argumentos:
+        banco.pool = banco.PoolConexoes(argumentos[0])
+    print(f"Versão do banco: {migrar()}")
+    if mesclar:
+        with conexao() as conn:
+            print(f"👥 {mesclar_duplicados(conn)} jogadores repetidos mesclados")
+    if reconstruir:
+        with conexao() as conn:
+            reconstruir_totais(conn)
+        print("📊 Totais recalculados a partir dos resultados")
+    for consulta, plano, ok in verificar_planos():
+        print(f"{'✅' if ok else '⚠'} {consulta}\n    {plano}")
@@ -0,0 +1,248 @@
+import os
+import sys
+import gzip
+import time
+import atexit
+import sqlite3
+import shutil
+import datetime
+import tempfile
+import threading
+from contextlib import contextmanager
+
+from banco import conexao
+
+# ===============================
+# 🔹 ARQUIVO DE RESULTADOS ANTIGOS
+# ===============================
+# O quiz.db guarda só o evento atual. Os resultados de dias (ou meses)
+# anteriores vão para um arquivo .db separado por período dentro de
+# PASTA_PARTICOES, que só é anexado (ATTACH) quando alguém consulta.
+# Cada arquivo é independente: pode ser movido, copiado ou compactado.
+PASTA_PARTICOES = "arquivo"
+PERIODO_PARTICAO = "dia"   # "dia" ou "mes"
+FORMATOS_PERIODO = {"dia": "%Y-%m-%d", "mes": "%Y-%m"}
+INTERVALO_ARQUIVAMENTO = 10 * 60  # s entre verificações de virada do período
+
+
+def _inicio_do_periodo_atual(periodo):
+    inicio = datetime.datetime.now().replace(hour=0, minute=0, second=0, microsecond=0)
+    if periodo == "mes":
+        inicio = inicio.replace(day=1)
+    return int(inicio.timestamp() * 1000)
+
+
+def caminho_particao(chave):
+    return os.path.join(PASTA_PARTICOES, f"quiz-{chave}.db")
+
+
+def _criar_tabelas(conn, esquema):
+    conn.execute(f"""
+        CREATE TABLE IF NOT EXISTS {esquema}.jogadores (
+            id INTEGER PRIMARY KEY,
+            nome TEXT NOT NULL,
+            ano TEXT NOT NULL,
+            data_criacao INTEGER
+        )
+    """)
+    conn.execute(f"""
+        CREATE TABLE IF NOT EXISTS {esquema}.resultados (
+            id INTEGER PRIMARY KEY,
+            jogador_id INTEGER,
+            categoria TEXT,
+            acertou INTEGER,
+            data_criacao INTEGER
+        )
+    """)
+    conn.execute(f"CREATE INDEX IF NOT EXISTS {esquema}.idx_resultados_jogador ON resultados(jogador_id)")
+
+
+def arquivar(periodo=PERIODO_PARTICAO, antes_de=None):
+    """Move os resultados anteriores ao período atual para os arquivos de partição.
+
+    Devolve {chave_do_periodo: linhas_movidas}.
+    """
+    formato = FORMATOS_PERIODO[periodo]
+    if antes_de is None:
+        antes_de = _inicio_do_periodo_atual(periodo)
+    chave_sql = f"strftime('{formato}', data_criacao / 1000, 'unixepoch', 'localtime')"
+
+    movidas = {}
+    with conexao() as conn:
+        chaves = [linha[0] for linha in conn.execute(
+            f"SELECT DISTINCT {chave_sql} FROM resultados WHERE data_criacao < ?", (antes_de,)
+        )]
+        if chaves:
+            os.makedirs(PASTA_PARTICOES, exist_ok=True)
+
+        for chave in chaves:
+            # ATTACH não pode acontecer dentro de uma transação
+            conn.execute("ATTACH DATABASE ? AS particao", (caminho_particao(chave),))
+            try:
+                conn.execute("BEGIN IMMEDIATE")
+                _criar_tabelas(conn, "particao")
+                cursor = conn.execute(f"""
+                    INSERT OR IGNORE INTO particao.resultados
+                    SELECT id, jogador_id, categoria, acertou, data_criacao
+                    FROM main.resultados
+                    WHERE data_criacao < ? AND {chave_sql} = ?
+                """, (antes_de, chave))
+                movidas[chave] = cursor.rowcount
+                # cópia dos jogadores, para a partição se bastar sozinha
+                conn.execute("""
+                    INSERT OR REPLACE INTO particao.jogadores
+                    SELECT id, nome, ano, data_criacao FROM main.jogadores
+                    WHERE id IN (SELECT DISTINCT jogador_id FROM particao.resultados)
+                """)
+                conn.execute(f"""
+                    DELETE FROM main.resultados
+                    WHERE data_criacao < ? AND {chave_sql} = ?
+                """, (antes_de, chave))
+                conn.commit()
+            except Exception:
+                conn.rollback()
+                raise
+            finally:
+                conn.execute("DETACH DATABASE particao")
+    return movidas
+
+
+def listar_particoes():
+    """Devolve [(chave, caminho, compactada, bytes)] ordenado por período."""
+    if not os.path.isdir(PASTA_PARTICOES):
+        return []
+    particoes = []
+    for nome in sorted(os.listdir(PASTA_PARTICOES)):
+        if not nome.startswith("quiz-"):
+            continue
+        if nome.endswith(".db"):
+            chave, compactada = nome[5:-3], False
+        elif nome.endswith(".db.gz"):
+            chave, compactada = nome[5:-6], True
+        else:
+            continue
+        caminho = os.path.join(PASTA_PARTICOES, nome)
+        particoes.append((chave, caminho, compactada, os.path.getsize(caminho)))
+    return particoes
+
+
+def compactar(chave):
+    """Compacta (VACUUM + gzip) a partição de um período já fechado."""
+    caminho = caminho_particao(chave)
+    conn = sqlite3.connect(caminho)
+    conn.execute("VACUUM")
+    conn.close()
+    with open(caminho, "rb") as origem, gzip.open(caminho + ".gz", "wb") as destino:
+        shutil.copyfileobj(origem, destino)
+    os.remove(caminho)
+    return caminho + ".gz"
+
+
+def chaves_particoes():
+    """Períodos que têm arquivo (compactado ou não), do mais antigo ao mais novo."""
+    return sorted({chave for chave, _, _, _ in listar_particoes()})
+
+
+# partição compactada é descompactada uma vez por processo e reaproveitada
+# (relatórios com ?periodo=tudo abrem todas a cada consulta)
+_descompactadas = {}  # chave -> (caminho temporário, mtime do .gz)
+
+
+def _descompactada(chave):
+    compactada = caminho_particao(chave) + ".gz"
+    mtime = os.path.getmtime(compactada)
+    atual = _descompactadas.get(chave)
+    if atual and atual[1] == mtime and os.path.exists(atual[0]):
+        return atual[0]
+    descritor, temporario = tempfile.mkstemp(prefix=f"quiz-{chave}-", suffix=".db")
+    with os.fdopen(descritor, "wb") as destino, gzip.open(compactada, "rb") as origem:
+        shutil.copyfileobj(origem, destino)
+    if atual:
+        _apagar(atual[0])
+    _descompactadas[chave] = (temporario, mtime)
+    return temporario
+
+
+def _apagar(caminho):
+    try:
+        os.remove(caminho)
+    except OSError:
+        pass
+
+
+@atexit.register
+def _apagar_descompactadas():
+    for caminho, _ in _descompactadas.values():
+        _apagar(caminho)
+    _descompactadas.clear()
+
+
+@contextmanager
+def abrir_particao(chave):
+    """Anexa a partição (somente leitura) como esquema "particao".
+
+    Uso: `with abrir_particao("2025-10-08") as conn:` e depois
+    `SELECT ... FROM particao.resultados`.
+    """
+    caminho = caminho_particao(chave)
+    if not os.path.exists(caminho):
+        if not os.path.exists(caminho + ".gz"):
+            raise FileNotFoundError(f"Partição {chave} não encontrada")
+        caminho = _descompactada(chave)
+
+    with conexao() as conn:
+        uri = "file:" + os.path.abspath(caminho) + "?mode=ro"
+        conn.execute("ATTACH DATABASE ? AS particao", (uri,))
+        try:
+            yield conn
+        finally:
+            conn.rollback()
+            conn.execute("DETACH DATABASE particao")
+
+
+def consultar_particao(chave, sql, parametros=()):
+    """Roda `sql` (lendo de particao.jogadores / particao.resultados) e devolve as linhas."""
+    with abrir_particao(chave) as conn:
+        return conn.execute(sql, parametros).fetchall()
+
+
+# ===============================
+# 🔹 ARQUIVAMENTO COM O SERVIDOR LIGADO
+# ===============================
+# arquivar() roda na subida do servidor; numa feira de vários dias com o
+# servidor ligado direto, este agendador arquiva o dia anterior assim que
+# o período vira.
+def iniciar_agendador(periodo=PERIODO_PARTICAO, intervalo=INTERVALO_ARQUIVAMENTO):
+    def loop():
+        atual = _inicio_do_periodo_atual(periodo)
+        while True:
+            time.sleep(intervalo)
+            novo = _inicio_do_periodo_atual(periodo)
+            if novo == atual:
+                continue
+            try:
+                for chave, linhas in arquivar(periodo, novo).items():
+                    print(f"📦 {linhas} resultados de {chave} arquivados")
+                atual = novo
+            except (sqlite3.Error, OSError) as e:
+                print(f"⚠ Erro arquivando resultados antigos: {e}")
+
+    thread = threading.Thread(target=loop, daemon=True)
+    thread.start()
+    return thread
+
+
+if __name__ == "__main__":
+    # uso: python particoes.py arquivar [dia|mes]
+    #      python particoes.py listar
+    #      python particoes.py compactar <periodo>
+    comando = sys.argv[1] if len(sys.argv) > 1 else "listar"
+    if comando == "arquivar":
+        periodo = sys.argv[2] if len(sys.argv) > 2 else PERIODO_PARTICAO
+        for chave, linhas in arquivar(periodo).items():
+            print(f"📦 {chave}: {linhas} resultados arquivados")
+    elif comando == "compactar":
+        print(f"🗜 {compactar(sys.argv[2])}")
+    else:
+        for chave, caminho, compactada, tamanho in listar_particoes():
+            print(f"{chave}\t{tamanho // 1024} KB\t{'gz' if compactada else 'db'}\t{caminho}")
@@ -0,0 +1,454 @@
+import os
+import time
+import threading
+from collections import deque
+
+import serial
+from serial.tools import list_ports
+from eventlet import tpool
+from eventlet.hubs import trampoline
+
+from protocolo_serial import (
+    DecodificadorQuadros, montar_quadro, quadro_comando, negociar,
+    TIPO_ACK, TIPO_BOTAO, TIPO_EFEITO_FIM, COMANDOS_POR_CODIGO, TIMEOUT_ACK, TENTATIVAS_ENVIO, BAUD_RAPIDO,
+)
+from latencias import latencias, agora
+from gravacao_serial import PortaGravada, abrir_gravacao
+
+# ===============================
+# 🔹 LEITURA DA SERIAL POR EVENTO
+# ===============================
+# Em vez de readline() com timeout + sleep, a leitura dorme até chegar
+# byte na porta: no Linux o eventlet espera o descritor ficar legível;
+# no Windows (sem descritor) a leitura bloqueante roda numa thread do
+# tpool. As linhas completas são montadas num buffer e entregues com o
+# instante do aperto (relógio de latencias.agora): no binário o Arduino
+# manda há quantos ms o botão foi apertado; no texto vale a hora da leitura.
+# No protocolo binário (protocolo_serial.py) os bytes viram quadros: cada
+# BOTAO é confirmado com ACK e entregue como a mesma linha "BTN<n>" do
+# protocolo de texto, e o EFEITO_FIM vira "FIM <comando>" (ou
+# "INTERROMPIDO <comando>"); os ACKs dos comandos vão para `ao_receber_ack`.
+TAMANHO_MAXIMO_LINHA = 256  # sem "\n" até aqui é lixo na linha: descarta
+
+
+class LeitorSerial:
+    def __init__(self, porta, ao_receber_linha, binario=False, ao_receber_ack=None):
+        self.porta = porta
+        self.ao_receber_linha = ao_receber_linha
+        self.ao_receber_ack = ao_receber_ack
+        self._buffer = bytearray()
+        self.decodificador = DecodificadorQuadros() if binario else None
+        self._ultimo_seq = None
+        self.erros_callback = 0
+        self._fd = None
+        if os.name == "posix" and hasattr(porta, "fileno"):
+            try:
+                self._fd = porta.fileno()
+            except Exception:
+                self._fd = None
+
+    def _ler_bloqueando(self):
+        # espera o primeiro byte (até o timeout da porta) e pega o resto que já chegou
+        dados = self.porta.read(1)
+        if dados and self.porta.in_waiting:
+            dados += self.porta.read(self.porta.in_waiting)
+        return dados
+
+    def esperar_bytes(self):
+        if self._fd is not None:
+            trampoline(self._fd, read=True)
+            return self.porta.read(self.porta.in_waiting or 1)
+        return tpool.execute(self._ler_bloqueando)
+
+    def _entregar(self, linha, instante):
+        # erro de quem trata a linha (emit, bug no servidor) não é erro da
+        # serial: se subisse, a porta seria fechada e o Arduino reiniciado
+        try:
+            self.ao_receber_linha(linha, instante)
+        except Exception as e:
+            self.erros_callback += 1
+            print(f"⚠ Erro tratando a linha {linha!r} do Arduino: {e!r}")
+
+    def processar_quadros(self, dados, recebido_em):
+        for tipo, seq, conteudo in self.decodificador.alimentar(dados):
+            if tipo == TIPO_ACK:
+                if self.ao_receber_ack:
+                    self.ao_receber_ack(seq)
+            elif tipo == TIPO_BOTAO and conteudo:
+                # ACK sempre (o anterior pode ter se perdido); seq repetido é
+                # reenvio do mesmo aperto e não vai de novo para o navegador.
+                # Quadro de 5 bytes: escreve direto, sem passar pelo tpool.
+                self.porta.write(montar_quadro(TIPO_ACK, seq))
+                if seq != self._ultimo_seq:
+                    self._ultimo_seq = seq
+                    idade = int.from_bytes(conteudo[1:3], "little") / 1000 if len(conteudo) >= 3 else 0
+                    self._entregar(f"BTN{conteudo[0]}", recebido_em - idade)
+            elif tipo == TIPO_EFEITO_FIM and len(conteudo) >= 2:
+                comando = COMANDOS_POR_CODIGO.get(conteudo[0])
+                if comando:
+                    self._entregar(f"{'FIM' if conteudo[1] else 'INTERROMPIDO'} {comando}", recebido_em)
+
+    def processar(self, dados, recebido_em=None):
+        if recebido_em is None:
+            recebido_em = agora()
+        if self.decodificador is not None:
+            self.processar_quadros(dados, recebido_em)
+            return
+        self._buffer += dados
+        while True:
+            fim = self._buffer.find(b"\n")
+            if fim < 0:
+                break
+            linha = bytes(self._buffer[:fim]).decode(errors="ignore").strip()
+            del self._buffer[:fim + 1]
+            if linha:
+                self._entregar(linha, recebido_em)
+        if len(self._buffer) > TAMANHO_MAXIMO_LINHA:
+            self._buffer.clear()
+
+    def rodar(self):
+        while True:
+            dados = self.esperar_bytes()
+            if dados:
+                self.processar(dados, agora())
+
+
+# ===============================
+# 🔹 FILA DE COMANDOS PARA O ARDUINO
+# ===============================
+# Os handlers do Socket.IO só colocam o comando na fila e voltam na hora;
+# uma green thread separada escreve na serial (a escrita em si roda no
+# tpool, então porta lenta ou travada não segura o servidor).
+#  - comando igual ao último que ainda está na fila é descartado (coalescência)
+#  - RESET apaga os efeitos que ainda não foram enviados e vai na frente
+#  - com o Arduino desconectado os comandos esperam na fila e são enviados
+#    quando ele volta, menos os que ficaram velhos demais para fazer sentido
+COMANDOS_PRIORITARIOS = {"RESET"}
+VALIDADE_COMANDO = 10.0  # s; efeito atrasado mais que isso não é reenviado
+
+
+class FilaComandos:
+    def __init__(self, porta=None, quiosque_id=None):
+        self.porta = porta
+        self.quiosque_id = quiosque_id
+        self.binario = False
+        self._pendentes = deque()  # (comando, instante em que entrou na fila)
+        self._acordar = threading.Event()
+        self._seq = 0
+        self._ack = threading.Event()
+        self.estatisticas = {
+            "enfileirados": 0,
+            "enviados": 0,
+            "coalescidos": 0,
+            "cancelados_por_reset": 0,
+            "expirados": 0,
+            "reenviados": 0,
+            "retransmissoes": 0,
+            "sem_confirmacao": 0,
+            "erros": 0,
+            "profundidade_maxima": 0,
+            "ultima_escrita_ms": None,
+        }
+
+    def enviar(self, comando):
+        """Coloca o comando na fila sem bloquear; devolve False se foi descartado.
+
+        Sem Arduino conectado o comando fica na fila até a reconexão.
+        """
+        if comando in COMANDOS_PRIORITARIOS:
+            self.estatisticas["cancelados_por_reset"] += len(self._pendentes)
+            self._pendentes.clear()
+            self._pendentes.appendleft((comando, time.monotonic()))
+        elif self._pendentes and self._pendentes[-1][0] == comando:
+            # só junta com o último: [ACERTOU, ERROU] + ACERTOU tem que
+            # terminar em ACERTOU, que é a resposta mais nova
+            self.estatisticas["coalescidos"] += 1
+            return False
+        else:
+            self._pendentes.append((comando, time.monotonic()))
+        self.estatisticas["enfileirados"] += 1
+        self.estatisticas["profundidade_maxima"] = max(
+            self.estatisticas["profundidade_maxima"], len(self._pendentes)
+        )
+        self._acordar.set()
+        return True
+
+    def profundidade(self):
+        return len(self._pendentes)
+
+    def conectar_porta(self, porta, binario=False):
+        """Passa a escrever nesta porta e envia o que ficou pendente."""
+        self.porta = porta
+        self.binario = binario
+        if self._pendentes:
+            self.estatisticas["reenviados"] += len(self._pendentes)
+        self._acordar.set()
+
+    def desconectar_porta(self):
+        self.porta = None
+
+    def receber_ack(self, seq):
+        if seq == self._seq:
+            self._ack.set()
+
+    def _escrever_confirmado(self, comando):
+        # mesmo seq em todas as tentativas: o Arduino ignora o repetido
+        self._seq = (self._seq + 1) & 0xFF
+        quadro = quadro_comando(comando, self._seq)
+        for tentativa in range(TENTATIVAS_ENVIO):
+            self._ack.clear()
+            if tentativa:
+                self.estatisticas["retransmissoes"] += 1
+            tpool.execute(self.porta.write, quadro)
+            if self._ack.wait(TIMEOUT_ACK):
+                return
+        self.estatisticas["sem_confirmacao"] += 1
+        print(f"⚠ Arduino não confirmou {comando} depois de {TENTATIVAS_ENVIO} tentativas")
+
+    def _escrever(self, comando):
+        inicio = time.perf_counter()
+        if self.binario:
+            self._escrever_confirmado(comando)
+        else:
+            tpool.execute(self.porta.write, (comando + "\n").encode())
+        self.estatisticas["ultima_escrita_ms"] = round((time.perf_counter() - inicio) * 1000, 3)
+
+    def rodar(self):
+        while True:
+            self._acordar.wait()
+            self._acordar.clear()
+            # sem porta a fila só espera: conectar_porta() acorda de novo
+            while self._pendentes and self.porta is not None:
+                comando, instante = self._pendentes.popleft()
+                if time.monotonic() - instante > VALIDADE_COMANDO:
+                    self.estatisticas["expirados"] += 1
+                    continue
+                try:
+                    self._escrever(comando)
+                    self.estatisticas["enviados"] += 1
+                    latencias.registrar("comando_arduino", instante, time.monotonic(), self.quiosque_id)
+                except Exception as e:
+                    self.estatisticas["erros"] += 1
+                    print(f"⚠ Erro ao enviar {comando} para o Arduino: {e}")
+                    # volta para a frente da fila (a não ser que um RESET já
+                    # tenha cancelado tudo) e espera a reconexão
+                    if not any(p in COMANDOS_PRIORITARIOS for p, _ in self._pendentes):
+                        self._pendentes.appendleft((comando, instante))
+                    break
+
+    def resumo(self):
+        return dict(self.estatisticas, profundidade=self.profundidade())
+
+
+# ===============================
+# 🔹 VÁRIOS QUIOSQUES NO MESMO SERVIDOR
+# ===============================
+# Cada quiosque tem o seu Arduino (porta serial), a sua fila de comandos e
+# uma sala do Socket.IO ("quiosque-<id>"). Os botões de um Arduino só vão
+# para os navegadores daquela sala, e os comandos de um navegador só vão
+# para o Arduino do quiosque dele.
+#
+# Cabo solto não derruba o quiosque: um supervisor por quiosque percebe a
+# queda (erro na leitura), fecha a porta e tenta reconectar com espera
+# crescente. Se a porta configurada sumiu (o Linux costuma trocar
+# /dev/ttyACM0 por /dev/ttyACM1 ao religar), procura outra porta com cara
+# de Arduino que nenhum outro quiosque esteja usando.
+RECONEXAO_ESPERA_INICIAL = 0.5   # s
+RECONEXAO_ESPERA_MAXIMA = 10.0   # s
+ESPERA_BOOT_ARDUINO = 2.0        # abrir a porta reinicia o Arduino; comandos antes disso se perdem
+PROCURAR_PORTAS = True
+# fabricantes USB comuns de placas Arduino e clones (Arduino, Arduino.org, CH340, FTDI)
+FABRICANTES_ARDUINO = {0x2341, 0x2A03, 0x1A86, 0x0403}
+
+
+def portas_candidatas(em_uso=()):
+    """Portas seriais que parecem ser um Arduino, fora as já usadas."""
+    candidatas = []
+    for info in list_ports.comports():
+        if info.device in em_uso:
+            continue
+        descricao = f"{info.description} {info.manufacturer or ''}".lower()
+        if info.vid in FABRICANTES_ARDUINO or "arduino" in descricao or "ttyacm" in info.device.lower():
+            candidatas.append(info.device)
+    return candidatas
+
+
+class Quiosque:
+    def __init__(self, quiosque_id, porta, baud, baud_rapido=BAUD_RAPIDO, pasta_gravacao=None):
+        self.id = str(quiosque_id)
+        self.porta_configurada = porta
+        self.porta = porta
+        self.baud = baud
+        self.baud_rapido = baud_rapido  # None: nem tenta o protocolo binário
+        self.protocolo = None
+        self.pasta_gravacao = pasta_gravacao  # grava o tráfego de cada conexão (gravacao_serial.py)
+        self.gravacao = None
+        self.sala = f"quiosque-{self.id}"
+        self.arduino = None
+        self.comandos = FilaComandos(quiosque_id=self.id)
+        self.desconectado_desde = time.monotonic()
+        self.estatisticas = {
+            "conexoes": 0,
+            "quedas": 0,
+            "tentativas": 0,
+            "ultima_reconexao_ms": None,
+            "maior_reconexao_ms": None,
+        }
+
+    def _abrir(self, porta):
+        try:
+            # sempre abre no baud do sketch; negociar() sobe depois
+            return serial.Serial(porta, self.baud, timeout=1)
+        except (serial.SerialException, OSError):
+            return None
+
+    def conectar(self, em_uso=(), avisar=True):
+        self.estatisticas["tentativas"] += 1
+        arduino = self._abrir(self.porta_configurada)
+        porta = self.porta_configurada
+        if arduino is None and PROCURAR_PORTAS:
+            for porta in portas_candidatas(em_uso):
+                arduino = self._abrir(porta)
+                if arduino is not None:
+                    break
+        if arduino is None:
+            if avisar:
+                print(f"⚠ Quiosque {self.id}: não foi possível conectar ao Arduino em {self.porta_configurada}.")
+            return False
+
+        if self.pasta_gravacao:
+            gravador = abrir_gravacao(self.pasta_gravacao, self.id, porta, self.baud)
+            arduino = PortaGravada(arduino, gravador)
+            self.gravacao = gravador.caminho
+        self.arduino = arduino
+        self.porta = porta
+        self.estatisticas["conexoes"] += 1
+        if self.estatisticas["conexoes"] > 1:
+            # tempo com o quiosque sem Arduino, da queda até a porta abrir de novo
+            tempo = round((time.monotonic() - self.desconectado_desde) * 1000, 1)
+            self.estatisticas["ultima_reconexao_ms"] = tempo
+            self.estatisticas["maior_reconexao_ms"] = max(self.estatisticas["maior_reconexao_ms"] or 0, tempo)
+            print(f"🔌 Quiosque {self.id}: Arduino reconectado em {porta} ({tempo} ms)")
+        else:
+            print(f"Quiosque {self.id}: conectado ao Arduino na porta {porta}")
+        return True
+
+    def fechar(self):
+        """Fecha a porta (e a gravação, se houver) sem contar como queda."""
+        self.comandos.desconectar_porta()
+        if self.arduino is not None:
+            try:
+                self.arduino.close()
+            except Exception:
+                pass
+        self.arduino = None
+        self.protocolo = None
+
+    def desconectar(self):
+        self.fechar()
+        self.estatisticas["quedas"] += 1
+        self.desconectado_desde = time.monotonic()
+
+    def supervisionar(self, ao_receber_linha, em_uso=lambda: ()):
+        """Lê o Arduino para sempre, reconectando quando o cabo sai e volta."""
+        espera = RECONEXAO_ESPERA_INICIAL
+        avisar = False  # a primeira falha já foi avisada por conectar()
+        while True:
+            if self.arduino is None:
+                if not self.conectar(em_uso(), avisar=avisar):
+                    avisar = False
+                    time.sleep(espera)
+                    espera = min(espera * 2, RECONEXAO_ESPERA_MAXIMA)
+                    continue
+            espera = RECONEXAO_ESPERA_INICIAL
+            time.sleep(ESPERA_BOOT_ARDUINO)
+
+            try:
+                binario = self.negociar()
+                self.comandos.conectar_porta(self.arduino, binario)
+                # acorda assim que chegam bytes, sem sleep fixo entre leituras
+                leitor = LeitorSerial(
+                    self.arduino, lambda linha, instante: ao_receber_linha(self, linha, instante),
+                    binario=binario, ao_receber_ack=self.comandos.receber_ack,
+                )
+                leitor.rodar()
+            except Exception as e:
+                print(f"⚠ Quiosque {self.id}: Arduino desconectado ({e}). Tentando reconectar...")
+            self.desconectar()
+            avisar = False
+
+    def negociar(self):
+        """Sobe para o protocolo binário se o sketch suportar; devolve True se subiu."""
+        baud = None
+        if self.baud_rapido:
+            baud = tpool.execute(negociar, self.arduino, self.baud_rapido)
+        if baud is None:
+            self.protocolo = f"texto {self.arduino.baudrate}"
+        else:
+            self.protocolo = f"binario {baud}"
+        print(f"Quiosque {self.id}: protocolo {self.protocolo}")
+        return baud is not None
+
+    def resumo(self):
+        return dict(
+            self.estatisticas,
+            porta=self.porta,
+            protocolo=self.protocolo,
+            gravacao=self.gravacao,
+            conectado=self.arduino is not None,
+            comandos=self.comandos.resumo(),
+        )
+
+
+class GerenciadorQuiosques:
+    def __init__(self, portas, baud, baud_rapido=BAUD_RAPIDO, pasta_gravacao=None):
+        # portas: {id do quiosque: porta serial}; o primeiro é o padrão
+        self.quiosques = {
+            str(q): Quiosque(q, porta, baud, baud_rapido, pasta_gravacao) for q, porta in portas.items()
+        }
+        self.padrao = next(iter(self.quiosques))
+
+    def portas_em_uso(self):
+        # portas de outros quiosques não entram na procura de um Arduino religado
+        em_uso = {quiosque.porta_configurada for quiosque in self.quiosques.values()}
+        em_uso.update(quiosque.porta for quiosque in self.quiosques.values() if quiosque.arduino)
+        return em_uso
+
+    def conectar(self):
+        for quiosque in self.quiosques.values():
+            quiosque.conectar(self.portas_em_uso())
+
+    def pegar(self, quiosque_id=None):
+        """Quiosque pelo id; id vazio é o quiosque padrão.
+
+        KeyError se o id não é de nenhum quiosque (?quiosque= digitado errado
+        não pode mandar os botões de um quiosque para a tela de outro).
+        """
+        if quiosque_id is None or quiosque_id == "":
+            return self.quiosques[self.padrao]
+        try:
+            return self.quiosques[str(quiosque_id)]
+        except KeyError:
+            raise KeyError(f"Quiosque desconhecido: {quiosque_id!r}") from None
+
+    def enviar(self, quiosque_id, comando):
+        return self.pegar(quiosque_id).comandos.enviar(comando)
+
+    def iniciar(self, iniciar_tarefa, ao_receber_linha):
+        """Começa a leitura (com reconexão) e a fila de cada quiosque.
+
+        `iniciar_tarefa` é o socketio.start_background_task e
+        `ao_receber_linha(quiosque, linha, instante)` recebe as linhas de cada
+        Arduino; `instante` é a hora do aperto (latencias.agora).
+        """
+        for quiosque in self.quiosques.values():
+            iniciar_tarefa(quiosque.supervisionar, ao_receber_linha, self.portas_em_uso)
+            iniciar_tarefa(quiosque.comandos.rodar)
+
+    def fechar(self):
+        # ao desligar o servidor: fecha as portas e termina as gravações
+        for quiosque in self.quiosques.values():
+            quiosque.fechar()
+
+    def resumo(self):
+        return {quiosque.id: quiosque.resumo() for quiosque in self.quiosques.values()}
@@ -0,0 +1,149 @@
+import time
+import struct
+
+# ===============================
+# 🔹 PROTOCOLO BINÁRIO COM O ARDUINO
+# ===============================
+# Quadro: 0x7E | tamanho | tipo | seq | dados (tamanho bytes) | crc8
+# O crc8 (polinômio 0x07) cobre tamanho, tipo, seq e dados. Quadro com
+# crc errado é descartado e a leitura procura o próximo 0x7E.
+#
+# Cada COMANDO e cada BOTAO é confirmado com um ACK que leva o mesmo seq.
+# Sem ACK o quadro é reenviado (mesmo seq), e quem recebe ignora o seq
+# repetido, então o efeito não roda duas vezes.
+#
+# Ao abrir a porta (sempre em 9600) o servidor manda HELLO pedindo um baud
+# mais alto. O sketch novo responde HELLO_OK e os dois trocam de baud; o
+# sketch antigo não responde e o servidor segue no protocolo de texto
+# ("BTN1" / "ACERTOU\n"). Depois do HELLO_OK o servidor manda um PING; o
+# sketch que não recebe o PING em 2 s volta para 9600 e para o texto, então
+# um HELLO_OK perdido não deixa os dois falando protocolos diferentes.
+INICIO_QUADRO = 0x7E
+TAMANHO_MAXIMO_DADOS = 32
+
+TIPO_HELLO = 0x01      # servidor -> Arduino: dados = baud desejado (uint32 LE)
+TIPO_COMANDO = 0x02    # servidor -> Arduino: dados = código do comando (+ argumentos)
+TIPO_PING = 0x03       # servidor -> Arduino: só pede ACK (confirma o baud novo)
+TIPO_BOTAO = 0x10      # Arduino -> servidor: dados = número do botão + idade do aperto (uint16 LE, ms)
+TIPO_EFEITO_FIM = 0x11 # Arduino -> servidor: dados = código do comando + 1 concluído / 0 interrompido
+TIPO_HELLO_OK = 0x81   # Arduino -> servidor: dados = versão (uint8) + baud aceito (uint32 LE)
+TIPO_ACK = 0x7F        # os dois sentidos: seq do quadro confirmado
+
+VERSAO_PROTOCOLO = 1
+CODIGOS_COMANDO = {"ACERTOU": 1, "ERROU": 2, "BONUS": 3, "RESET": 4}
+COMANDOS_POR_CODIGO = {codigo: comando for comando, codigo in CODIGOS_COMANDO.items()}
+
+BAUD_LEGADO = 9600
+BAUD_RAPIDO = 115200
+TIMEOUT_ACK = 0.1           # s; depois disso o quadro é reenviado
+TENTATIVAS_ENVIO = 3
+TIMEOUT_NEGOCIACAO = 0.5    # s esperando HELLO_OK / ACK do PING
+ESPERA_VOLTA_BAUD = 2.2     # o sketch volta para 9600 após 2 s sem quadro no baud novo
+
+
+def crc8(dados):
+    crc = 0
+    for byte in dados:
+        crc ^= byte
+        for _ in range(8):
+            crc = ((crc << 1) ^ 0x07) & 0xFF if crc & 0x80 else (crc << 1) & 0xFF
+    return crc
+
+
+def montar_quadro(tipo, seq, dados=b""):
+    if len(dados) > TAMANHO_MAXIMO_DADOS:
+        raise ValueError(f"Quadro com {len(dados)} bytes de dados (máximo {TAMANHO_MAXIMO_DADOS})")
+    corpo = bytes((len(dados), tipo, seq & 0xFF)) + bytes(dados)
+    return bytes((INICIO_QUADRO,)) + corpo + bytes((crc8(corpo),))
+
+
+def quadro_comando(comando, seq):
+    return montar_quadro(TIPO_COMANDO, seq, bytes((CODIGOS_COMANDO[comando],)))
+
+
+class DecodificadorQuadros:
+    """Monta quadros a partir dos bytes que chegam, em pedaços de qualquer tamanho."""
+
+    def __init__(self):
+        self._buffer = bytearray()
+        self.erros_crc = 0
+
+    def alimentar(self, dados):
+        """Devolve a lista de (tipo, seq, dados) dos quadros completos."""
+        self._buffer += dados
+        quadros = []
+        while True:
+            inicio = self._buffer.find(INICIO_QUADRO)
+            if inicio < 0:
+                self._buffer.clear()
+                break
+            del self._buffer[:inicio]
+            if len(self._buffer) < 2:
+                break
+            tamanho = self._buffer[1]
+            if tamanho > TAMANHO_MAXIMO_DADOS:
+                del self._buffer[:1]
+                continue
+            fim = 5 + tamanho
+            if len(self._buffer) < fim:
+                break
+            corpo = bytes(self._buffer[1:fim - 1])
+            if crc8(corpo) != self._buffer[fim - 1]:
+                # 0x7E no meio de dados ou ruído: tenta a partir do próximo byte
+                self.erros_crc += 1
+                del self._buffer[:1]
+                continue
+            quadros.append((corpo[1], corpo[2], corpo[3:]))
+            del self._buffer[:fim]
+        return quadros
+
+
+def _esperar_quadro(porta, tipo, seq=None, espera=TIMEOUT_NEGOCIACAO):
+    decodificador = DecodificadorQuadros()
+    limite = time.monotonic() + espera
+    while time.monotonic() < limite:
+        dados = porta.read(porta.in_waiting or 1)
+        for recebido, recebido_seq, conteudo in decodificador.alimentar(dados):
+            if recebido == tipo and (seq is None or recebido_seq == seq):
+                return conteudo
+    return None
+
+
+def _confirmar_baud(porta):
+    porta.write(montar_quadro(TIPO_PING, 0))
+    return _esperar_quadro(porta, TIPO_ACK, 0) is not None
+
+
+def negociar(porta, baud_desejado=BAUD_RAPIDO):
+    """Tenta passar a porta (recém-aberta em 9600) para o protocolo binário.
+
+    Devolve o baud em uso no protocolo binário, ou None se o Arduino só
+    fala o protocolo de texto. Bloqueante: rodar no tpool.
+    """
+    timeout_original = porta.timeout
+    porta.timeout = 0.05
+    try:
+        porta.reset_input_buffer()
+        # o "\n" no fim faz o sketch antigo descartar o HELLO como uma linha qualquer
+        porta.write(montar_quadro(TIPO_HELLO, 0, struct.pack("<I", baud_desejado)) + b"\n")
+        resposta = _esperar_quadro(porta, TIPO_HELLO_OK)
+        if resposta is None or len(resposta) < 5:
+            return None
+        _versao, baud = struct.unpack("<BI", resposta[:5])
+        if baud != porta.baudrate:
+            baud_anterior = porta.baudrate
+            time.sleep(0.01)  # o Arduino termina de mandar o HELLO_OK antes de trocar
+            porta.baudrate = baud
+            if not _confirmar_baud(porta):
+                # o cabo não aguentou o baud novo: os dois voltam para o anterior
+                porta.baudrate = baud_anterior
+                time.sleep(ESPERA_VOLTA_BAUD)
+                porta.reset_input_buffer()
+                if not _confirmar_baud(porta):
+                    return None
+        elif not _confirmar_baud(porta):
+            # mesmo sem trocar de baud o sketch espera o PING para ficar no binário
+            return None
+        return porta.baudrate
+    finally:
+        porta.timeout = timeout_original
@@ -1,18 +1,30 @@
 import eventlet
 eventlet.monkey_patch()
-from flask import Flask, render_template, request, jsonify
-from flask_socketio import SocketIO
-import serial
-import threading
-import time
-import sqlite3
-import datetime
+from flask import Flask, render_template, request, jsonify, abort
+from flask_socketio import SocketIO, join_room
+import banco
+from banco import conexao, com_retentativa, agora_ms, registrar_jogador, FilaGravacao
+from migracoes import migrar, verificar_planos
+from particoes import arquivar, chaves_particoes, consultar_particao, abrir_particao
+from particoes import iniciar_agendador as iniciar_arquivamento
+from ponte_serial import GerenciadorQuiosques
+from manutencao import iniciar_agendador as iniciar_manutencao, ultimas_manutencoes
+from latencias import latencias, apertos, agora
+from sessoes import sessoes, normalizar_jogador_id
 
 # ===============================
 # 🔹 CONFIGURAÇÃO DA PORTA SERIAL
 # ===============================
 PORTA_SERIAL = 'COM3'
 BAUD = 9600
+# o sketch novo sobe para o protocolo binário neste baud; None = só texto
+BAUD_RAPIDO = 115200
+# um Arduino por quiosque: id do quiosque -> porta serial
+# ex.: {"1": "COM3", "2": "COM4"} ou {"1": "/dev/ttyACM0", "2": "/dev/ttyACM1"}
+QUIOSQUES = {"1": PORTA_SERIAL}
+# pasta onde gravar todo o tráfego serial (None = não grava); para repetir
+# depois: python gravacao_serial.py repetir gravacoes/quiosque-1-....serial
+GRAVAR_SERIAL = None
 
 # ===============================
 # 🔹 INICIALIZAÇÃO DO FLASK
@@ -21,55 +33,32 @@ app = Flask(__name__)
 socketio = SocketIO(app, cors_allowed_origins="*")
 
 # ===============================
-# 🔹 CONECTA AO ARDUINO
+# 🔹 CONECTA AOS ARDUINOS
 # ===============================
-try:
-    arduino = serial.Serial(PORTA_SERIAL, BAUD, timeout=1)
-    print(f"Conectado ao Arduino na porta {PORTA_SERIAL}")
-    print("Entre em http://localhost:5001")
-except:
-    arduino = None
-    print("⚠ Não foi possível conectar ao Arduino. Verifique a porta.")
+quiosques = GerenciadorQuiosques(QUIOSQUES, BAUD, BAUD_RAPIDO, GRAVAR_SERIAL)
+quiosques.conectar()
+print("Entre em http://localhost:5001 (outro quiosque: ?quiosque=<id>)")
 
 # ===============================
 # 🔹 BANCO DE DADOS
 # ===============================
+# True: jogadores/resultados ficam em memória e vão para o quiz.db a cada
+# banco.INTERVALO_GRAVACAO_DISCO segundos (bom para cartão SD lento)
+BANCO_EM_MEMORIA = False
+
 def criar_banco():
-    conn = sqlite3.connect("quiz.db")
-    c = conn.cursor()
-
-    # tabela jogadores
-    c.execute("""
-        CREATE TABLE IF NOT EXISTS jogadores (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            nome TEXT NOT NULL,
-            ano TEXT NOT NULL,
-            data_criacao TEXT
-        )
-    """)
-
-    # tabela resultados (cada questão salva)
-    c.execute("""
-        CREATE TABLE IF NOT EXISTS resultados (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            jogador_id INTEGER,
-            categoria TEXT,
-            acertou INTEGER,
-            data_criacao TEXT,
-            FOREIGN KEY(jogador_id) REFERENCES jogadores(id)
-        )
-    """)
-
-    conn.commit()
-    conn.close()
-criar_banco()
-# ===============================
-# 🔹 VARIÁVEIS DO JOGO
-# ===============================
-acertos = 0
-nome_atual = None
-ano_atual = None
+    # cria as tabelas ou atualiza bancos antigos para o esquema atual
+    migrar()
+    for consulta, plano, ok in verificar_planos():
+        if not ok:
+            print(f"⚠ Consulta sem índice: {consulta} -> {plano}")
 
+    # resultados de dias anteriores saem do quiz.db e vão para arquivo/
+    for periodo, linhas in arquivar().items():
+        print(f"📦 {linhas} resultados de {periodo} arquivados")
+if BANCO_EM_MEMORIA:
+    banco.usar_memoria()
+criar_banco()
 # ===============================
 # 🔹 ROTA PRINCIPAL
 # ===============================
@@ -78,154 +67,429 @@ def index():
     return render_template('index.html')
 
 # ===============================
-# 🔹 THREAD PARA LER O ARDUINO
+# 🔹 THREAD PARA LER OS ARDUINOS
 # ===============================
-def ler_serial():
-    if not arduino:
-        print("Arduino não conectado. Apenas o site funcionará.")
-        return
-    while True:
-        try:
-            linha = arduino.readline().decode(errors='ignore').strip()
-            if linha and linha.startswith("BTN"):
-                print(f"Botão pressionado: {linha}")
-                socketio.emit('botao', {'botao': linha})
-            time.sleep(0.01)
-        except Exception as e:
-            print(f"Erro lendo serial: {e}")
-            break
-
-
-def salvar_resultado_bd(jogador_id, categoria, acertou):
-    data_atual = datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-    conn = sqlite3.connect("quiz.db")
-    cursor = conn.cursor()
-    cursor.execute("""
-        INSERT INTO resultados (jogador_id, categoria, acertou, data_criacao)
-        VALUES (?, ?, ?, ?)
-    """, (jogador_id, categoria, acertou, data_atual))
-    conn.commit()
-    conn.close()
+def ao_receber_linha(quiosque, linha, instante):
+    # botão de um Arduino vai só para os navegadores do mesmo quiosque
+    if linha.startswith("BTN"):
+        recebido = agora()
+        # o navegador devolve o id do aperto no ack e na resposta (latências)
+        aperto_id = apertos.novo(quiosque.id, instante)
+        # hora do aperto no botão (não a da leitura), em ms como agora_ms()
+        apertado_em = agora_ms() - int((recebido - instante) * 1000)
+        print(f"Botão pressionado no quiosque {quiosque.id}: {linha}")
+        socketio.emit('botao', {
+            'botao': linha, 'quiosque': quiosque.id, 'aperto': aperto_id, 'apertado_em': apertado_em,
+        }, to=quiosque.sala)
+        emitido = agora()
+        apertos.pegar(aperto_id)["emit"] = emitido
+        latencias.registrar("aperto_serial", instante, recebido, quiosque.id)
+        latencias.registrar("serial_emit", recebido, emitido, quiosque.id)
+    elif linha.startswith(("FIM ", "INTERROMPIDO ")):
+        # o Arduino terminou (ou largou no meio) o efeito de ACERTOU/ERROU/BONUS
+        situacao, efeito = linha.split(" ", 1)
+        socketio.emit('efeito_fim', {'efeito': efeito, 'concluido': situacao == "FIM", 'quiosque': quiosque.id},
+                      to=quiosque.sala)
+
+@socketio.on('botao_recebido')
+def handle_botao_recebido(data):
+    aperto = apertos.pegar((data or {}).get("aperto"))
+    if aperto and "emit" in aperto:
+        latencias.registrar("emit_navegador", aperto["emit"], quiosque=aperto["quiosque"])
+
+# ===============================
+# 🔹 SESSÃO (PARTIDA) DE CADA NAVEGADOR
+# ===============================
+# Jogador, acertos e quiosque ficam na sessão da conexão (sessoes.py):
+# dois navegadores no mesmo servidor não misturam as partidas.
+@socketio.on('connect')
+def handle_connect():
+    # o navegador diz o quiosque na conexão: io(url, {query: {quiosque: "2"}})
+    try:
+        quiosque = quiosques.pegar(request.args.get("quiosque"))
+    except KeyError as e:
+        print(f"⚠ Conexão recusada: {e.args[0]} (quiosques: {', '.join(quiosques.quiosques)})")
+        return False
+    sessoes.abrir(request.sid, quiosque.id)
+    join_room(quiosque.sala)
+
+@socketio.on('disconnect')
+def handle_disconnect(*args):
+    sessoes.fechar(request.sid)
+
+def sessao_atual(jogador_id=None):
+    """Sessão da conexão; o jogador_id (já validado) liga ou retoma a partida."""
+    return sessoes.associar_jogador(sessoes.pegar(request.sid), jogador_id)
+
+def enviar_arduino(comando):
+    # comandos para o Arduino (ACERTOU/ERROU/BONUS/RESET) saem pela fila do quiosque
+    return quiosques.enviar(sessoes.pegar(request.sid).quiosque_id, comando)
+
+
+def resultados_gravados(marcas):
+    gravado = agora()
+    for recebido, aperto, quiosque_id in marcas:
+        latencias.registrar("resposta_commit", recebido, gravado, quiosque_id)
+        if aperto:
+            latencias.registrar("aperto_commit", aperto["apertado"], gravado, quiosque_id)
+
+# respostas vão para a fila e são gravadas em lote (um commit por lote)
+fila_resultados = FilaGravacao("""
+    INSERT INTO resultados (jogador_id, categoria, acertou, data_criacao)
+    VALUES (?, ?, ?, ?)
+""", ao_gravar=resultados_gravados)
+
+def validar_resultado(jogador_id, categoria, acertou):
+    """Converte os campos para o que a tabela espera; ValueError se não der.
+
+    A linha só é gravada depois, no lote: um valor ruim que passasse daqui
+    só ia dar erro no commit, longe de quem mandou.
+    """
+    jogador_id = normalizar_jogador_id(jogador_id)
+    if isinstance(acertou, str):
+        acertou = acertou.strip().lower()
+        acertou = {"1": 1, "true": 1, "0": 0, "false": 0}.get(acertou, acertou)
+    if acertou not in (0, 1):  # True/False também entram aqui
+        raise ValueError(f"acertou inválido: {acertou!r}")
+    if categoria is None:
+        categoria = "Sem categoria"
+    elif not isinstance(categoria, str):
+        raise ValueError(f"categoria inválida: {categoria!r}")
+    return jogador_id, categoria, int(acertou)
+
+def salvar_resultado_bd(jogador_id, categoria, acertou, marca=None):
+    jogador_id, categoria, acertou = validar_resultado(jogador_id, categoria, acertou)
+    fila_resultados.adicionar((jogador_id, categoria, acertou, agora_ms()), marca)
+
+def marcar_resposta(data):
+    """Latência aperto -> resposta; devolve a marca para medir até o commit."""
+    recebido = agora()
+    quiosque_id = sessoes.pegar(request.sid).quiosque_id
+    aperto = apertos.pegar(data.get("aperto"))
+    if aperto:
+        latencias.registrar("aperto_resposta", aperto["apertado"], recebido, quiosque_id)
+    return (recebido, aperto, quiosque_id)
 
 @app.route('/salvar_jogador', methods=['POST'])
 def salvar_jogador():
     data = request.json
     nome = data.get("nome")
     ano = data.get("ano")
-    data_atual = datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-
-    conn = sqlite3.connect("quiz.db")
-    cursor = conn.cursor()
-    cursor.execute("""
-        INSERT INTO jogadores (nome, ano, data_criacao)
-        VALUES (?, ?, ?)
-    """, (nome, ano, data_atual))
-    jogador_id = cursor.lastrowid  # pega o ID gerado
-    conn.commit()
-    conn.close()
+
+    # mesmo nome e ano reaproveitam o jogador já cadastrado
+    jogador_id = com_retentativa(registrar_jogador, nome, ano)
 
     return jsonify({"status": "ok", "id": jogador_id})
 
 
+@socketio.on('novo_jogador')
+def handle_novo_jogador(data):
+    sessao = sessoes.pegar(request.sid)
+    sessao.nome = data.get("nome")
+    sessao.ano = data.get("ano")
+    sessao.reiniciar()
+
+@socketio.on('jogador_salvo')
+def handle_jogador_salvo(data):
+    try:
+        jogador_id = normalizar_jogador_id(data.get("jogador_id"))
+    except ValueError as e:
+        print(f"⚠ jogador_salvo ignorado: {e}")
+        return
+    sessao = sessao_atual(jogador_id)
+    sessao.nome = data.get("nome", sessao.nome)
+    sessao.ano = data.get("ano", sessao.ano)
+
+def validar_resposta(data, acertou):
+    """Campos da resposta já convertidos, ou None (e o aviso) se não valem.
+
+    Valida antes de mexer na sessão: um jogador_id ruim não pode zerar a
+    partida nem virar o jogador da sessão.
+    """
+    try:
+        return validar_resultado(data.get("jogador_id"), data.get("categoria", "Sem categoria"), acertou)
+    except ValueError as e:
+        print(f"⚠ Resposta ignorada: {e}")
+        return None
+
 @socketio.on('acertou')
 def handle_acerto(data):
-    jogador_id = data.get("jogador_id")
-    categoria = data.get("categoria", "Sem categoria")
-    global acertos
-    acertos += 1
-    print(f"✅ Jogador {jogador_id} acertou ({acertos}) - Categoria: {categoria}")
+    resposta = validar_resposta(data, 1)
+    if resposta is None:
+        return
+    jogador_id, categoria, acertou = resposta
+    sessao = sessao_atual(jogador_id)
+    sessao.acertos += 1
+    sessao.respostas += 1
+    print(f"✅ Jogador {jogador_id} acertou ({sessao.acertos}) - Categoria: {categoria}")
     
     # Salva no banco
-    salvar_resultado_bd(jogador_id, categoria, 1)
+    salvar_resultado_bd(jogador_id, categoria, acertou, marcar_resposta(data))
     
-    # Envia para Arduino
-    if arduino:
-        arduino.write(b"ACERTOU\n")
+    # Envia para Arduino (pela fila, não espera a serial)
+    enviar_arduino("ACERTOU")
 
 @socketio.on('errou')
 def handle_erro(data):
-    jogador_id = data.get("jogador_id")
-    categoria = data.get("categoria", "Sem categoria")
+    resposta = validar_resposta(data, 0)
+    if resposta is None:
+        return
+    jogador_id, categoria, acertou = resposta
+    sessao = sessao_atual(jogador_id)
+    sessao.respostas += 1
     print(f"❌ Jogador {jogador_id} errou - Categoria: {categoria}")
     
-    salvar_resultado_bd(jogador_id, categoria, 0)
+    salvar_resultado_bd(jogador_id, categoria, acertou, marcar_resposta(data))
     
-    if arduino:
-        arduino.write(b"ERROU\n")
+    enviar_arduino("ERROU")
 
 @socketio.on('recompensa')
-def handle_recompensa():
-    global acertos
-    print(f"🏆 Página da recompensa: {acertos} acertos")
-    if arduino and acertos >= 6:
-        arduino.write(b"BONUS\n")
+def handle_recompensa(*args):
+    sessao = sessoes.pegar(request.sid)
+    print(f"🏆 Página da recompensa: {sessao.acertos} acertos")
+    if sessao.acertos >= 6:
+        enviar_arduino("BONUS")
 
 @socketio.on('reset')
-def handle_reset():
-    global acertos, nome_atual, ano_atual
-    acertos = 0
-    nome_atual = None
-    ano_atual = None
+def handle_reset(*args):
+    sessao = sessoes.pegar(request.sid)
+    sessao.reiniciar()
+    sessao.nome = sessao.ano = None
     print("🔄 Jogo reiniciado! Acertos zerados.")
-    if arduino:
-        try:
-            arduino.write(b"RESET\n")
+    # RESET passa na frente e cancela efeitos que ainda não saíram
+    if enviar_arduino("RESET"):
+        if quiosques.pegar(sessao.quiosque_id).arduino is not None:
             print("📤 Comando RESET enviado para o Arduino")
-        except Exception as e:
-            print(f"⚠️ Erro ao enviar RESET para o Arduino: {e}")
+        else:
+            print("📥 Comando RESET enfileirado (Arduino desconectado)")
             
 @app.route('/salvar_resultado', methods=['POST'])
 def salvar_resultado():
-    data = request.json
+    data = request.get_json(silent=True) or {}
     jogador_id = data.get("jogador_id")
     categoria = data.get("categoria")
     acertou = data.get("acertou")
-    data_atual = datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-
-    conn = sqlite3.connect("quiz.db")
-    cursor = conn.cursor()
-    cursor.execute("""
-        INSERT INTO resultados (jogador_id, categoria, acertou, data_criacao
-        )
-        VALUES (?, ?, ?, ?)
-    """, (jogador_id, categoria, acertou, data_atual))
-    conn.commit()
-    conn.close()
+
+    try:
+        salvar_resultado_bd(jogador_id, categoria, acertou)
+    except ValueError as e:
+        return jsonify({"status": "erro", "mensagem": str(e)}), 400
 
     return jsonify({"status": "ok", "mensagem": "Resultado salvo com sucesso!"})
 
 
+# ===============================
+# 🔹 RELATÓRIOS
+# ===============================
+# Com RELATORIOS_DO_SNAPSHOT os relatórios leem a cópia periódica do banco
+# (banco.snapshot) e nunca encostam no quiz.db que os quiosques gravam.
+# A idade da cópia, em segundos, vai no cabeçalho X-Idade-Snapshot.
+RELATORIOS_DO_SNAPSHOT = True
+ROTAS_RELATORIO = {"relatorio", "relatorio_geral", "participantes_por_ano"}
+
+def conexao_relatorio():
+    if RELATORIOS_DO_SNAPSHOT:
+        return banco.snapshot.conexao()
+    fila_resultados.descarregar()  # garante que as respostas recentes aparecem
+    return conexao()
+
+@app.after_request
+def idade_do_snapshot(resposta):
+    if RELATORIOS_DO_SNAPSHOT and request.endpoint in ROTAS_RELATORIO:
+        resposta.headers["X-Idade-Snapshot"] = str(banco.snapshot.idade())
+    return resposta
+
+# Resultados de dias anteriores ficam nas partições (particoes.py), fora do
+# quiz.db. Os relatórios aceitam ?periodo=:
+#   atual       só o quiz.db (padrão de /relatorio e /participantes)
+#   <período>   só aquele arquivo, ex. 2025-10-08 (lista em /relatorio/periodos)
+#   tudo        quiz.db + todas as partições (padrão de /relatorio/<id>)
+def periodos_pedidos(padrao="atual"):
+    """Devolve (inclui o quiz.db?, [partições]); 404 se o período não existe."""
+    periodo = request.args.get("periodo", padrao)
+    if periodo == "atual":
+        return True, []
+    if periodo == "tudo":
+        return True, chaves_particoes()
+    if periodo not in chaves_particoes():
+        abort(404, f"Período {periodo} não arquivado")
+    return False, [periodo]
+
+def somar_totais(totais, chave, dados, acertos, erros):
+    atual = totais.setdefault(chave, dict(dados, acertos=0, erros=0))
+    atual["acertos"] += acertos or 0
+    atual["erros"] += erros or 0
+
+@app.route('/relatorio/periodos')
+def periodos_relatorio():
+    return jsonify(["atual"] + chaves_particoes())
+
 @app.route('/relatorio/<int:player_id>')
 def relatorio(player_id):
-    conn = sqlite3.connect('quiz.db')
-    cursor = conn.cursor()
-    
-    # Buscar resultados reais do jogador
-    cursor.execute("SELECT categoria, acertou FROM resultados WHERE jogador_id=?", (player_id,))
-    resultados = cursor.fetchall()  # [(questao, acertou), ...]
-    
+    incluir_atual, particoes = periodos_pedidos("tudo")
+    resultados, jogador = [], None
+    if incluir_atual:
+        with conexao_relatorio() as conn:
+            cursor = conn.cursor()
+
+            # Buscar resultados reais do jogador
+            cursor.execute("SELECT categoria, acertou FROM resultados WHERE jogador_id=?", (player_id,))
+            resultados = cursor.fetchall()  # [(questao, acertou), ...]
+
+            # Buscar nome do jogador
+            cursor.execute("SELECT nome FROM jogadores WHERE id=?", (player_id,))
+            jogador = cursor.fetchone()
+
+    # os dias anteriores vêm das partições (cada uma tem cópia dos jogadores)
+    for chave in particoes:
+        with abrir_particao(chave) as conn:
+            resultados += conn.execute(
+                "SELECT categoria, acertou FROM particao.resultados WHERE jogador_id=?", (player_id,)
+            ).fetchall()
+            if jogador is None:
+                jogador = conn.execute("SELECT nome FROM particao.jogadores WHERE id=?", (player_id,)).fetchone()
+
     # Transformar em acertos e erros
     resultados_formatados = [
         (categoria, acertou, 0 if acertou else 1) for categoria, acertou in resultados
     ]
-    
-    # Buscar nome do jogador
-    cursor.execute("SELECT nome FROM jogadores WHERE id=?", (player_id,))
-    jogador = cursor.fetchone()
     nome = jogador[0] if jogador else "Jogador Desconhecido"
     
-    conn.close()
-    
     return render_template('relatorio.html', nome=nome, resultados=resultados_formatados, jogadores=[])
 
+# ===============================
+# 🔹 PARTICIPANTES (PAGINADO)
+# ===============================
+LIMITE_PADRAO = 50
+LIMITE_MAXIMO = 200
+
 @app.route('/participantes/<ano>')
 def participantes_por_ano(ano):
-    conn = sqlite3.connect("quiz.db")
-    cursor = conn.cursor()
-    cursor.execute("SELECT id, nome FROM jogadores WHERE ano = ?", (ano,))
-    jogadores = cursor.fetchall()
-    lista_jogadores = [{"id": j[0], "nome": j[1]} for j in jogadores]
-    return jsonify(lista_jogadores)
+    # Paginação por cursor: ?limite=50&depois=<último id da página anterior>
+    # e opcionalmente ?prefixo=An para filtrar pelo começo do nome.
+    # O id para pedir a próxima página vem no cabeçalho X-Proximo.
+    limite = max(1, min(request.args.get("limite", LIMITE_PADRAO, type=int), LIMITE_MAXIMO))
+    depois = request.args.get("depois", 0, type=int)
+    prefixo = request.args.get("prefixo", "")
+
+    filtro_nome, parametros = "", [ano, depois]
+    if prefixo:
+        escapado = prefixo.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+        filtro_nome = "AND j.nome LIKE ? ESCAPE '\\'"
+        parametros.append(escapado + "%")
+    parametros.append(limite)
+
+    incluir_atual, particoes = periodos_pedidos()
+    jogadores = []
+    if incluir_atual:
+        with conexao_relatorio() as conn:
+            # acertos/erros vêm da tabela de totais (uma linha por jogador)
+            jogadores = conn.execute(f"""
+                SELECT j.id, j.nome,
+                       COALESCE(t.acertos, 0) AS acertos,
+                       COALESCE(t.total - t.acertos, 0) AS erros
+                FROM jogadores j
+                LEFT JOIN totais_jogador t ON t.jogador_id = j.id
+                WHERE j.ano = ? AND j.id > ? {filtro_nome}
+                ORDER BY j.id
+                LIMIT ?
+            """, parametros).fetchall()
+    for chave in particoes:
+        # partição não tem tabela de totais: soma os resultados dela
+        jogadores += consultar_particao(chave, f"""
+            SELECT j.id, j.nome, SUM(r.acertou), COUNT(*) - SUM(r.acertou)
+            FROM particao.jogadores j
+            JOIN particao.resultados r ON r.jogador_id = j.id
+            WHERE j.ano = ? AND j.id > ? {filtro_nome}
+            GROUP BY j.id
+            ORDER BY j.id
+            LIMIT ?
+        """, parametros)
+
+    # cada origem trouxe os `limite` primeiros ids depois do cursor; juntos,
+    # os `limite` menores ids da soma estão todos completos
+    totais = {}
+    for jogador_id, nome, acertos, erros in jogadores:
+        somar_totais(totais, jogador_id, {"id": jogador_id, "nome": nome}, acertos, erros)
+    lista_jogadores = [totais[jogador_id] for jogador_id in sorted(totais)[:limite]]
+
+    resposta = jsonify(lista_jogadores)
+    if len(lista_jogadores) == limite:
+        resposta.headers["X-Proximo"] = str(lista_jogadores[-1]["id"])
+    return resposta
+
+@app.route('/relatorio')
+def relatorio_geral():
+    incluir_atual, particoes = periodos_pedidos()
+    totais, categorias = [], []
+    if incluir_atual:
+        with conexao_relatorio() as conn:
+            # Totais por jogador
+            totais = conn.execute("""
+                SELECT j.id, j.nome, j.ano, t.acertos, t.total - t.acertos AS erros
+                FROM totais_jogador t
+                JOIN jogadores j ON j.id = t.jogador_id
+                WHERE t.total > 0
+            """).fetchall()
+
+            # Totais por categoria (geral)
+            categorias = conn.execute("""
+                SELECT categoria, acertos, total - acertos AS erros
+                FROM totais_categoria
+                WHERE total > 0
+            """).fetchall()
+
+    for chave in particoes:
+        with abrir_particao(chave) as conn:
+            totais += conn.execute("""
+                SELECT j.id, j.nome, j.ano, SUM(r.acertou), COUNT(*) - SUM(r.acertou)
+                FROM particao.resultados r
+                JOIN particao.jogadores j ON j.id = r.jogador_id
+                GROUP BY j.id
+            """).fetchall()
+            categorias += conn.execute("""
+                SELECT categoria, SUM(acertou), COUNT(*) - SUM(acertou)
+                FROM particao.resultados
+                GROUP BY categoria
+            """).fetchall()
+
+    por_jogador, por_categoria = {}, {}
+    for jogador_id, nome, ano, acertos, erros in totais:
+        somar_totais(por_jogador, jogador_id, {"id": jogador_id, "nome": nome, "ano": ano}, acertos, erros)
+    for categoria, acertos, erros in categorias:
+        somar_totais(por_categoria, categoria, {"categoria": categoria}, acertos, erros)
+
+    return jsonify({
+        "jogadores": list(por_jogador.values()),
+        "categorias": list(por_categoria.values()),
+    })
+
+@app.route('/estatisticas/banco')
+def estatisticas_banco():
+    # conflitos de trava, tempo esperando lock e checkpoints do WAL
+    return jsonify(banco.estatisticas())
+
+@app.route('/estatisticas/serial')
+def estatisticas_serial():
+    # por quiosque: porta, conexão e a fila de comandos (profundidade, coalescidos...)
+    return jsonify(quiosques.resumo())
+
+@app.route('/estatisticas/latencia')
+def estatisticas_latencia():
+    # p50/p95/p99 de cada etapa do aperto, no total e por quiosque; ?zerar=1 recomeça
+    resumo = latencias.resumo()
+    if request.args.get("zerar"):
+        latencias.zerar()
+    return jsonify(resumo)
+
+@app.route('/estatisticas/sessoes')
+def estatisticas_sessoes():
+    return jsonify(sessoes.resumo())
+
+@app.route('/estatisticas/manutencao')
+def estatisticas_manutencao():
+    # últimas rodadas de VACUUM/ANALYZE/checkpoint com tamanho e tempos
+    return jsonify(ultimas_manutencoes())
 
 
 
@@ -233,5 +497,20 @@ def participantes_por_ano(ano):
 # 🔹 INICIA O SERVIDOR
 # ===============================
 if __name__ == '__main__':
-    socketio.start_background_task(ler_serial)
-    socketio.run(app, host='0.0.0.0', port=5001)
+    quiosques.iniciar(socketio.start_background_task, ao_receber_linha)
+    banco.iniciar_checkpoints()
+    iniciar_arquivamento()
+    if RELATORIOS_DO_SNAPSHOT:
+        banco.snapshot.iniciar()
+    if BANCO_EM_MEMORIA:
+        banco.banco_memoria.iniciar()
+    else:
+        iniciar_manutencao()
+    try:
+        socketio.run(app, host='0.0.0.0', port=5001)
+    finally:
+        quiosques.fechar()
+        fila_resultados.parar()
+        print(f"⏱ Latências gravadas em {latencias.despejar()}")
+        if BANCO_EM_MEMORIA:
+            banco.banco_memoria.gravar()
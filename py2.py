@@ -8,6 +8,8 @@ import time
 import sqlite3
 import datetime
 
+from banco import cache_jogadores
+
 # ===============================
 # 🔹 CONFIGURAÇÃO DA PORTA SERIAL
 # ===============================
@@ -99,8 +101,24 @@ def ler_serial():
 # ===============================
 # 🔹 FUNÇÃO PARA SALVAR RESULTADOS
 # ===============================
+def buscar_ou_criar_jogador(c, nome, ano):
+    c.execute("SELECT id FROM jogadores WHERE nome=? AND ano=?", (nome, ano))
+    jogador = c.fetchone()
+    if jogador:
+        return jogador[0]
+    # cria novo jogador caso não exista
+    c.execute("INSERT INTO jogadores (nome, ano) VALUES (?, ?)", (nome, ano))
+    return c.lastrowid
+
+def id_do_jogador(c, nome, ano):
+    # mesmo cache LRU (com acertos/falhas) das outras versões do servidor
+    jogador_id = cache_jogadores.pegar(nome, ano)
+    if jogador_id is None:
+        jogador_id = buscar_ou_criar_jogador(c, nome, ano)
+        cache_jogadores.guardar(nome, ano, jogador_id)
+    return jogador_id
+
 def salvar_resultado(categoria, acertou):
-    global nome_atual, ano_atual
     if not nome_atual or not ano_atual:
         print("⚠ Nenhum jogador ativo. Resultado não salvo.")
         return
@@ -108,25 +126,23 @@ def salvar_resultado(categoria, acertou):
     conn = sqlite3.connect("quiz.db")
     c = conn.cursor()
 
-    # procura jogador atual
-    c.execute("SELECT id FROM jogadores WHERE nome=? AND ano=?", (nome_atual, ano_atual))
-    jogador = c.fetchone()
+    try:
+        # id do jogador atual (normalmente já está no cache desde o novo_jogador)
+        jogador_id = id_do_jogador(c, nome_atual, ano_atual)
 
-    if jogador:
-        jogador_id = jogador[0]
-    else:
-        # cria novo jogador caso não exista
-        c.execute("INSERT INTO jogadores (nome, ano) VALUES (?, ?)", (nome_atual, ano_atual))
-        jogador_id = c.lastrowid
-
-    data_atual = datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-    c.execute("""
-        INSERT INTO resultados (jogador_id, categoria, acertou, data)
-        VALUES (?, ?, ?, ?)
-    """, (jogador_id, categoria, acertou, data_atual))
+        data_atual = datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+        c.execute("""
+            INSERT INTO resultados (jogador_id, categoria, acertou, data)
+            VALUES (?, ?, ?, ?)
+        """, (jogador_id, categoria, acertou, data_atual))
 
-    conn.commit()
-    conn.close()
+        conn.commit()
+    except Exception:
+        # se o jogador foi criado nesta transação, o id guardado não vale mais
+        cache_jogadores.invalidar(nome_atual, ano_atual)
+        raise
+    finally:
+        conn.close()
     print(f"💾 Resultado salvo no banco para {nome_atual} - {categoria}: {'Acertou' if acertou else 'Errou'}")
 
 # ===============================
@@ -141,15 +157,18 @@ def handle_novo_jogador(data):
 
     print(f"🎮 Novo jogador: {nome_atual} ({ano_atual})")
 
-    # já salva no banco ao iniciar se não existir
-    conn = sqlite3.connect("quiz.db")
-    c = conn.cursor()
-    c.execute("SELECT id FROM jogadores WHERE nome=? AND ano=?", (nome_atual, ano_atual))
-    jogador = c.fetchone()
-    if not jogador:
-        c.execute("INSERT INTO jogadores (nome, ano) VALUES (?, ?)", (nome_atual, ano_atual))
-        conn.commit()
-    conn.close()
+    # já salva no banco ao iniciar se não existir, e deixa o id no cache para as respostas
+    if nome_atual and ano_atual:
+        conn = sqlite3.connect("quiz.db")
+        c = conn.cursor()
+        try:
+            id_do_jogador(c, nome_atual, ano_atual)
+            conn.commit()
+        except Exception:
+            cache_jogadores.invalidar(nome_atual, ano_atual)
+            raise
+        finally:
+            conn.close()
 
 @socketio.on('acertou')
 def handle_acerto(data=None):
@@ -179,6 +198,8 @@ def handle_recompensa():
 @socketio.on('reset')
 def handle_reset():
     global acertos, nome_atual, ano_atual
+    if nome_atual:
+        cache_jogadores.invalidar(nome_atual, ano_atual)
     acertos = 0
     nome_atual = None
     ano_atual = None
@@ -1,12 +1,12 @@
 import eventlet
 eventlet.monkey_patch()
-from flask import Flask, render_template
+from flask import Flask, render_template, request
 from flask_socketio import SocketIO
 import serial
-import threading
 import time
-import sqlite3
-import datetime
+from banco import conexao, agora_ms, cache_jogadores, id_do_jogador, normalizar_nome
+from migracoes import migrar
+from sessoes import sessoes
 
 PORTA_SERIAL = 'COM4'
 BAUD = 9600
@@ -26,40 +26,11 @@ except:
 
 # ===== BANCO DE DADOS =====
 def criar_banco():
-    conn = sqlite3.connect("quiz.db")
-    c = conn.cursor()
-
-    # tabela jogadores
-    c.execute("""
-        CREATE TABLE IF NOT EXISTS jogadores (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            nome TEXT NOT NULL,
-            ano TEXT NOT NULL
-        )
-    """)
-
-    # tabela resultados (cada questão salva)
-    c.execute("""
-        CREATE TABLE IF NOT EXISTS resultados (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            jogador_id INTEGER,
-            categoria TEXT,
-            acertou INTEGER,
-            data TEXT,
-            FOREIGN KEY(jogador_id) REFERENCES jogadores(id)
-        )
-    """)
-
-    conn.commit()
-    conn.close()
+    # esquema e índices ficam em migracoes.py (mesmo banco do py16.py)
+    migrar()
 
 criar_banco()
 
-# ===== VARIÁVEIS DO JOGO =====
-acertos = 0
-nome_atual = None
-ano_atual = None
-
 # ===== ROTA PRINCIPAL (CARREGA O SITE) =====
 @app.route('/')
 def index():
@@ -82,83 +53,90 @@ def ler_serial():
             break
 
 # ===== EVENTOS SOCKETIO =====
+# cada navegador tem a sua sessão (jogador e acertos), ver sessoes.py
+@socketio.on('connect')
+def handle_connect():
+    sessoes.abrir(request.sid)
+
+@socketio.on('disconnect')
+def handle_disconnect(*args):
+    sessoes.fechar(request.sid)
+
 @socketio.on('novo_jogador')
 def handle_novo_jogador(data):
     """Recebe nome e ano do jogador quando o jogo começa"""
-    global nome_atual, ano_atual, acertos
-    nome_atual = data.get("nome")
-    ano_atual = data.get("ano")
-    acertos = 0
-    print(f"🎮 Novo jogador: {nome_atual} ({ano_atual})")
+    sessao = sessoes.pegar(request.sid)
+    sessao.nome = data.get("nome")
+    sessao.ano = data.get("ano")
+    sessao.reiniciar()
+    print(f"🎮 Novo jogador: {sessao.nome} ({sessao.ano})")
+
+    # já guarda o id no cache, assim cada resposta não precisa procurar o jogador
+    if sessao.nome and sessao.ano:
+        with conexao() as conn:
+            id_do_jogador(conn, sessao.nome, sessao.ano)
 
 @socketio.on('acertou')
 def handle_acerto(data=None):
-    global acertos
-    acertos += 1
+    sessao = sessoes.pegar(request.sid)
+    sessao.acertos += 1
     categoria = data.get("categoria") if data else "Sem categoria"
-    print(f"✅ {nome_atual} acertou ({acertos} acertos) - Categoria: {categoria}")
+    print(f"✅ {sessao.nome} acertou ({sessao.acertos} acertos) - Categoria: {categoria}")
 
     # salva no banco
-    salvar_resultado(categoria, 1)
+    salvar_resultado(sessao, categoria, 1)
 
     if arduino:
         arduino.write(b"ACERTOU\n")
 
 @socketio.on('errou')
 def handle_erro(data=None):
+    sessao = sessoes.pegar(request.sid)
     categoria = data.get("categoria") if data else "Sem categoria"
-    print(f"❌ {nome_atual} errou - Categoria: {categoria}")
+    print(f"❌ {sessao.nome} errou - Categoria: {categoria}")
 
     # salva no banco
-    salvar_resultado(categoria, 0)
+    salvar_resultado(sessao, categoria, 0)
 
     if arduino:
         arduino.write(b"ERROU\n")
 
 @socketio.on('recompensa')
-def handle_recompensa():
-    global acertos
-    print(f"🏆 Página da recompensa: {acertos} acertos")
-    if arduino and acertos in [7, 8]:
+def handle_recompensa(*args):
+    sessao = sessoes.pegar(request.sid)
+    print(f"🏆 Página da recompensa: {sessao.acertos} acertos")
+    if arduino and sessao.acertos in [7, 8]:
         arduino.write(b"BONUS\n")
 
 @socketio.on('reset')
-def handle_reset():
-    global acertos, nome_atual, ano_atual
-    acertos = 0
-    nome_atual = None
-    ano_atual = None
+def handle_reset(*args):
+    sessao = sessoes.pegar(request.sid)
+    if sessao.nome:
+        cache_jogadores.invalidar(normalizar_nome(sessao.nome), sessao.ano)
+    sessao.reiniciar()
+    sessao.nome = sessao.ano = None
     print("🔄 Jogo reiniciado! Acertos zerados.")
 
 # ===== FUNÇÃO PARA SALVAR NO BANCO =====
-def salvar_resultado(categoria, acertou):
-    global nome_atual, ano_atual
+def salvar_resultado(sessao, categoria, acertou):
+    nome_atual, ano_atual = sessao.nome, sessao.ano
     if not nome_atual or not ano_atual:
         print("⚠ Nenhum jogador ativo. Resultado não salvo.")
         return
 
-    conn = sqlite3.connect("quiz.db")
-    c = conn.cursor()
-
-    # procura jogador atual
-    c.execute("SELECT id FROM jogadores WHERE nome=? AND ano=?", (nome_atual, ano_atual))
-    jogador = c.fetchone()
-
-    if jogador:
-        jogador_id = jogador[0]
-    else:
-        # cria novo jogador
-        c.execute("INSERT INTO jogadores (nome, ano) VALUES (?, ?)", (nome_atual, ano_atual))
-        jogador_id = c.lastrowid
-
-    data_atual = datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-    c.execute("""
-        INSERT INTO resultados (jogador_id, categoria, acertou, data)
-        VALUES (?, ?, ?, ?)
-    """, (jogador_id, categoria, acertou, data_atual))
+    try:
+        with conexao() as conn:
+            # id do jogador atual (normalmente já está no cache)
+            jogador_id = id_do_jogador(conn, nome_atual, ano_atual)
+            conn.execute("""
+                INSERT INTO resultados (jogador_id, categoria, acertou, data_criacao)
+                VALUES (?, ?, ?, ?)
+            """, (jogador_id, categoria, acertou, agora_ms()))
+    except Exception:
+        # se o jogador foi criado nesta transação, o id guardado não vale mais
+        cache_jogadores.invalidar(normalizar_nome(nome_atual), ano_atual)
+        raise
 
-    conn.commit()
-    conn.close()
     print(f"💾 Resultado salvo no banco para {nome_atual}")
 
 # ===== INICIA O SERVIDOR =====
@@ -0,0 +1,128 @@
+import time
+
+# ===============================
+# 🔹 UMA PARTIDA POR CONEXÃO
+# ===============================
+# Cada navegador conectado (sid do Socket.IO) tem a sua Sessao com o
+# jogador e os acertos da partida, em vez de variáveis globais que dois
+# navegadores no mesmo servidor estragariam um do outro.
+#
+# Quando a conexão cai, a sessão fica guardada pelo id do jogador por
+# TEMPO_RETOMADA segundos: se o navegador reconectar (sid novo) e mandar
+# o mesmo jogador_id, continua a partida de onde parou.
+TEMPO_RETOMADA = 60
+
+
+def normalizar_jogador_id(valor):
+    """jogador_id como int ("1" e 1 são o mesmo jogador); ValueError se não for um id."""
+    if isinstance(valor, bool):
+        raise ValueError(f"jogador_id inválido: {valor!r}")
+    try:
+        return int(valor)
+    except (TypeError, ValueError):
+        raise ValueError(f"jogador_id inválido: {valor!r}") from None
+
+
+class Sessao:
+    # __slots__: sem __dict__ por objeto, ocupa pouco com muitas conexões
+    __slots__ = ("sid", "quiosque_id", "jogador_id", "nome", "ano", "acertos", "respostas", "inicio")
+
+    def __init__(self, sid, quiosque_id=None):
+        self.sid = sid
+        self.quiosque_id = quiosque_id
+        self.jogador_id = None
+        self.nome = None
+        self.ano = None
+        self.reiniciar()
+
+    def reiniciar(self):
+        """Zera a partida (o jogador continua o mesmo até o próximo novo_jogador)."""
+        self.acertos = 0
+        self.respostas = 0
+        self.inicio = time.time()
+
+    def resumo(self):
+        return {
+            "sid": self.sid, "quiosque": self.quiosque_id, "jogador_id": self.jogador_id,
+            "nome": self.nome, "ano": self.ano, "acertos": self.acertos, "respostas": self.respostas,
+            "duracao": round(time.time() - self.inicio),
+        }
+
+
+class GerenciadorSessoes:
+    def __init__(self, tempo_retomada=TEMPO_RETOMADA):
+        self.tempo_retomada = tempo_retomada
+        self._por_sid = {}
+        self._por_jogador = {}
+        self._desconectadas = {}  # jogador_id -> (sessao, desconectou_em)
+
+    def abrir(self, sid, quiosque_id=None):
+        sessao = Sessao(sid, quiosque_id)
+        self._por_sid[sid] = sessao
+        return sessao
+
+    def pegar(self, sid):
+        """Sessão da conexão; cria uma se o connect não passou por abrir()."""
+        sessao = self._por_sid.get(sid)
+        if sessao is None:
+            sessao = self.abrir(sid)
+        return sessao
+
+    def do_jogador(self, jogador_id):
+        return self._por_jogador.get(jogador_id)
+
+    def associar_jogador(self, sessao, jogador_id):
+        """Liga a sessão ao jogador; retoma a partida se ele tinha caído há pouco.
+
+        ValueError (e a sessão fica como estava) se jogador_id não é um id.
+        """
+        if jogador_id is None:
+            return sessao
+        jogador_id = normalizar_jogador_id(jogador_id)
+        if sessao.jogador_id == jogador_id:
+            return sessao
+        self._limpar_desconectadas()
+        antiga = self._desconectadas.pop(jogador_id, None)
+        if antiga and sessao.respostas == 0:
+            antiga = antiga[0]
+            antiga.sid, antiga.quiosque_id = sessao.sid, sessao.quiosque_id or antiga.quiosque_id
+            self._por_sid[sessao.sid] = antiga
+            self._por_jogador[jogador_id] = antiga
+            return antiga
+        if sessao.jogador_id is not None:
+            # outro jogador na mesma conexão: partida nova
+            if self._por_jogador.get(sessao.jogador_id) is sessao:
+                del self._por_jogador[sessao.jogador_id]
+            sessao.reiniciar()
+        sessao.jogador_id = jogador_id
+        self._por_jogador[jogador_id] = sessao
+        return sessao
+
+    def fechar(self, sid):
+        sessao = self._por_sid.pop(sid, None)
+        if sessao is None:
+            return None
+        if sessao.jogador_id is not None and self._por_jogador.get(sessao.jogador_id) is sessao:
+            del self._por_jogador[sessao.jogador_id]
+            if sessao.respostas:
+                self._desconectadas[sessao.jogador_id] = (sessao, time.monotonic())
+        self._limpar_desconectadas()
+        return sessao
+
+    def _limpar_desconectadas(self):
+        limite = time.monotonic() - self.tempo_retomada
+        for jogador_id in [j for j, (_, quando) in self._desconectadas.items() if quando < limite]:
+            del self._desconectadas[jogador_id]
+
+    def __len__(self):
+        return len(self._por_sid)
+
+    def resumo(self):
+        self._limpar_desconectadas()
+        return {
+            "conectadas": [sessao.resumo() for sessao in self._por_sid.values()],
+            "aguardando_retomada": len(self._desconectadas),
+        }
+
+
+sessoes = GerenciadorSessoes()